@@ -18,7 +18,7 @@ call venv\Scripts\activate.bat
 
 REM Проверяем зависимости
 echo 📦 Проверка зависимостей...
-python -c "import openpyxl, docx, weasyprint, jinja2" 2>nul
+python -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ('openpyxl', 'docx', 'weasyprint', 'jinja2')))" 2>nul
 if errorlevel 1 (
     echo ❌ Отсутствуют зависимости!
     echo Установите зависимости: pip install -r requirements.txt
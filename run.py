@@ -8,6 +8,7 @@
 import os
 import sys
 import platform
+import importlib.util
 import subprocess
 from pathlib import Path
 
@@ -33,17 +34,14 @@ def check_venv():
 
 
 def check_dependencies():
-    """Проверяет установленные зависимости"""
-    try:
-        import openpyxl
-        import docx
-        import weasyprint
-        import jinja2
-        return True
-    except ImportError as e:
-        print(f"❌ Отсутствуют зависимости: {e}")
+    """Проверяет установленные зависимости (поиском модулей, без их импорта)"""
+    missing = [name for name in ("openpyxl", "docx", "weasyprint", "jinja2")
+               if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Отсутствуют зависимости: {', '.join(missing)}")
         print("Установите зависимости: pip install -r requirements.txt")
         return False
+    return True
 
 
 def run_main():
@@ -17,7 +17,7 @@ source venv/bin/activate
 
 # Проверяем зависимости
 echo "📦 Проверка зависимостей..."
-python -c "import openpyxl, docx, weasyprint, jinja2" 2>/dev/null
+python -c "import importlib.util, sys; sys.exit(any(importlib.util.find_spec(m) is None for m in ('openpyxl', 'docx', 'weasyprint', 'jinja2')))" 2>/dev/null
 if [ $? -ne 0 ]; then
     echo "❌ Отсутствуют зависимости!"
     echo "Установите зависимости: pip install -r requirements.txt"
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки DataForgePDF
+Генерирует синтетические CSV/JSON/XLSX/DOCX/TXT файлы, отдельно замеряет
+чтение каждым DataReader и рендеринг каждым backend-ом PDFGenerator,
+фиксирует пиковое потребление памяти и сравнивает результаты с baseline JSON
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR / "src"))
+
+import main as dataforge  # noqa: E402
+
+TEMPLATE_PATH = str(PROJECT_DIR / "templates" / "template.html")
+
+LATIN = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+CYRILLIC = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+
+# Расширение и тип файла для каждого формата
+FORMATS = {
+    "csv": (".csv", "CSV файл"),
+    "json": (".json", "JSON файл"),
+    "xlsx": (".xlsx", "Excel файл"),
+    "docx": (".docx", "Word файл"),
+    "txt": (".txt", "Текстовый файл"),
+}
+
+
+def make_rows(rows, cols, cell_len, cyrillic, seed=42):
+    """Генерирует синтетическую таблицу: cyrillic - доля ячеек на кириллице (0..1)"""
+    rng = random.Random(seed)
+    columns = [f"Колонка {i + 1}" if cyrillic else f"Column {i + 1}" for i in range(cols)]
+    data = []
+    for _ in range(rows):
+        row = []
+        for _ in range(cols):
+            alphabet = CYRILLIC if rng.random() < cyrillic else LATIN
+            row.append("".join(rng.choice(alphabet) for _ in range(cell_len)))
+        data.append(row)
+    return columns, data
+
+
+def write_dataset(fmt, path, columns, data):
+    """Записывает таблицу в файл указанного формата"""
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(data)
+    elif fmt == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([dict(zip(columns, row)) for row in data], f, ensure_ascii=False)
+    elif fmt == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in data:
+                f.write("\t".join(row) + "\n")
+    elif fmt == "xlsx":
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(columns)
+        for row in data:
+            sheet.append(row)
+        workbook.save(path)
+    elif fmt == "docx":
+        from docx import Document
+        document = Document()
+        for row in data:
+            document.add_paragraph("\t".join(row))
+        document.save(path)
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+
+def measure_reader(path, fmt):
+    """Замеряет полное чтение файла (выполняется в отдельном процессе)"""
+    file_type = FORMATS[fmt][1]
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    columns, rows = dataforge.DataReader.stream(path, file_type)
+    count = sum(1 for _ in rows)
+    return {
+        "seconds": time.perf_counter() - started,
+        "cpu_seconds": time.process_time() - cpu_started,
+        "rows_read": count,
+        "peak_rss_mb": dataforge.peak_rss_mb(),
+    }
+
+
+def measure_backend(backend, rows, cols, cell_len, cyrillic, output_dir):
+    """Замеряет рендеринг готовой таблицы одним backend-ом (выполняется в отдельном процессе)"""
+    columns, data = make_rows(rows, cols, cell_len, cyrillic)
+    generator = dataforge.PDFGenerator(TEMPLATE_PATH)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    pdf_path = generator.generate_pdf(columns, data, output_dir, f"bench_{backend}", backend=backend)
+    return {
+        "seconds": time.perf_counter() - started,
+        "cpu_seconds": time.process_time() - cpu_started,
+        "output_bytes": os.path.getsize(pdf_path),
+        "peak_rss_mb": dataforge.peak_rss_mb(),
+    }
+
+
+def run_isolated(func, *args):
+    """Запускает замер в новом процессе, чтобы пиковая память не смешивалась между замерами"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def parse_list(value, cast):
+    """Разбирает список значений через запятую"""
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def run_benchmarks(args, work_dir):
+    """Прогоняет все комбинации параметров и возвращает список результатов"""
+    results = []
+    for rows in args.rows:
+        for cols in args.cols:
+            for cell_len in args.cell_len:
+                for cyrillic in args.cyrillic:
+                    params = {"rows": rows, "cols": cols, "cell_len": cell_len, "cyrillic": cyrillic}
+                    columns, data = make_rows(rows, cols, cell_len, cyrillic)
+
+                    for fmt in args.formats:
+                        path = os.path.join(work_dir, f"bench_{rows}_{cols}_{cell_len}_{cyrillic}{FORMATS[fmt][0]}")
+                        write_dataset(fmt, path, columns, data)
+                        results.append(run_case(args, dict(params, phase="read", target=fmt),
+                                                measure_reader, path, fmt))
+
+                    for backend in args.backends:
+                        results.append(run_case(args, dict(params, phase="render", target=backend),
+                                                measure_backend, backend, rows, cols, cell_len,
+                                                cyrillic, work_dir))
+    return results
+
+
+def run_case(args, case, func, *func_args):
+    """Выполняет замер несколько раз и сохраняет лучшее время"""
+    name = case_name(case)
+    best = None
+    for _ in range(args.repeat):
+        try:
+            result = run_isolated(func, *func_args)
+        except Exception as e:
+            print(f"⚠️  {name}: {e}")
+            return dict(case, name=name, error=str(e))
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+
+    rss = f"{best['peak_rss_mb']:.1f} МБ" if best["peak_rss_mb"] is not None else "н/д"
+    print(f"✅ {name:<60} {best['seconds']:8.3f} с  пик памяти {rss}")
+    return dict(case, name=name, **best)
+
+
+def case_name(case):
+    """Уникальное имя замера для сравнения с baseline"""
+    return (f"{case['phase']}:{case['target']}:rows={case['rows']}:cols={case['cols']}"
+            f":len={case['cell_len']}:cyr={case['cyrillic']}")
+
+
+def compare_with_baseline(results, baseline_path, threshold):
+    """Сравнивает результаты с baseline, возвращает количество регрессий"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {item["name"]: item for item in json.load(f)["results"]}
+
+    regressions = 0
+    print("\n📊 Сравнение с baseline:")
+    for result in results:
+        base = baseline.get(result["name"])
+        if base is None or "error" in result or "error" in base:
+            continue
+
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        status = "✅"
+        if ratio > 1 + threshold:
+            status = "❌"
+            regressions += 1
+        print(f"{status} {result['name']:<60} {base['seconds']:8.3f} с -> {result['seconds']:8.3f} с "
+              f"({(ratio - 1) * 100:+.1f}%)")
+
+    print(f"\nРегрессий (медленнее более чем на {threshold * 100:.0f}%): {regressions}")
+    return regressions
+
+
+def main():
+    """Основная функция бенчмарков"""
+    parser = argparse.ArgumentParser(description="Бенчмарки читателей и backend-ов DataForgePDF")
+    parser.add_argument("--rows", default="1000,10000", help="количества строк через запятую")
+    parser.add_argument("--cols", default="5,20", help="количества колонок через запятую")
+    parser.add_argument("--cell-len", default="12", help="длины ячеек через запятую")
+    parser.add_argument("--cyrillic", default="0,1", help="доли кириллических ячеек (0..1) через запятую")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="форматы входных файлов")
+    parser.add_argument("--backends", default=",".join(dataforge.PDFGenerator.BACKENDS),
+                        help="backend-ы рендеринга")
+    parser.add_argument("--repeat", type=int, default=1, help="повторов каждого замера (берется лучший)")
+    parser.add_argument("--output", default="benchmark_results.json", help="файл с результатами")
+    parser.add_argument("--baseline", help="baseline JSON для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимое замедление относительно baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    args.rows = parse_list(args.rows, int)
+    args.cols = parse_list(args.cols, int)
+    args.cell_len = parse_list(args.cell_len, int)
+    args.cyrillic = parse_list(args.cyrillic, float)
+    args.formats = parse_list(args.formats, str)
+    args.backends = parse_list(args.backends, str)
+
+    print("🚀 Бенчмарки DataForgePDF")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory(prefix="dataforgepdf-bench-") as work_dir:
+        results = run_benchmarks(args, work_dir)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Результаты сохранены: {args.output}")
+
+    if args.baseline:
+        return 1 if compare_with_baseline(results, args.baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
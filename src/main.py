@@ -5,252 +5,2411 @@ DataForgePDF - Генератор PDF из файлов данных
 Поддерживает CSV, JSON, Excel, Word и TXT файлы
 """
 
+import io
 import os
+import argparse
 import sys
 import csv
 import json
 import platform
+import re
+import glob
+import hashlib
+import importlib
+import importlib.util
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+from array import array
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Iterable, Iterator, Callable, Optional
 
-try:
-    import openpyxl
-    from docx import Document
-    from jinja2 import Template
-    # Импортируем WeasyPrint для основной генерации PDF с поддержкой кириллицы
+if TYPE_CHECKING:
+    # Только для аннотаций: во время выполнения эти модули импортируются лениво
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    from jinja2 import Environment, Template
+    from pypdf import PdfReader, PdfWriter
+    from reportlab.pdfbase.ttfonts import TTFont
+    from weasyprint import CSS
+    from weasyprint.document import Document
+    from weasyprint.text.fonts import FontConfiguration
+
+
+# Тяжелые зависимости (openpyxl, python-docx, jinja2, WeasyPrint, ReportLab, pypdf)
+# импортируются лениво в местах использования, чтобы меню появлялось сразу.
+# Здесь только проверяется их наличие без импорта.
+def _module_available(name: str) -> bool:
+    """Проверяет, установлен ли модуль, не импортируя его"""
     try:
-        import weasyprint
-        from weasyprint import HTML
-        USE_WEASYPRINT = True
-        print("✅ WeasyPrint доступен для генерации PDF с поддержкой кириллицы")
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# WeasyPrint - основная генерация PDF с поддержкой кириллицы
+USE_WEASYPRINT = _module_available('weasyprint')
+if USE_WEASYPRINT:
+    print("✅ WeasyPrint доступен для генерации PDF с поддержкой кириллицы")
+else:
+    print("⚠️  WeasyPrint недоступен, будет использован ReportLab")
+
+# ReportLab - fallback и быстрая генерация
+REPORTLAB_AVAILABLE = _module_available('reportlab')
+
+# pypdf нужен только для склейки фрагментов при параллельном рендеринге и оптимизации размера PDF
+PYPDF_AVAILABLE = _module_available('pypdf')
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Возвращает пиковое потребление памяти (RSS) текущим процессом в МБ"""
+    # В Linux ru_maxrss наследуется через fork/exec от родителя, а VmHWM - нет
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    
+    try:
+        import resource
     except ImportError:
-        USE_WEASYPRINT = False
-        print("⚠️  WeasyPrint недоступен, будет использован ReportLab")
+        return None  # Windows
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+class Instrumentation:
+    """Структурированные замеры фаз конвертации
+    
+    Каждая фаза (scan, read, template, layout, write, ...) порождает запись со
+    временем, CPU-временем, пиковой памятью процесса и счетчиками (строки,
+    страницы, байты). Записи получают подключенные обработчики: функции из
+    add_hook, JSON Lines файл (DATAFORGEPDF_METRICS, '-' - stderr) и функция
+    'module:function' (DATAFORGEPDF_METRICS_HOOK). Переменные окружения
+    наследуются процессами-воркерами, поэтому их замеры попадают туда же.
+    Без обработчиков замеры не выполняются.
+    """
+    
+    ENV_JSONL = 'DATAFORGEPDF_METRICS'
+    ENV_HOOK = 'DATAFORGEPDF_METRICS_HOOK'
+    
+    _hooks: List[Callable[[Dict[str, Any]], None]] = []
+    _env_hooks: Optional[List[Callable[[Dict[str, Any]], None]]] = None
+    
+    @classmethod
+    def add_hook(cls, hook: Callable[[Dict[str, Any]], None]):
+        """Подключает обработчик записей текущего процесса"""
+        cls._hooks.append(hook)
+    
+    @classmethod
+    def configure(cls, jsonl_path: Optional[str] = None, hook_path: Optional[str] = None):
+        """Включает вывод в JSON Lines и/или внешний обработчик для процесса и его воркеров"""
+        if jsonl_path:
+            os.environ[cls.ENV_JSONL] = jsonl_path
+        if hook_path:
+            os.environ[cls.ENV_HOOK] = hook_path
+        cls._env_hooks = None
+    
+    @staticmethod
+    def _jsonl_writer(path: str) -> Callable[[Dict[str, Any]], None]:
+        """Создает обработчик, дописывающий записи в JSON Lines файл"""
+        def write(record: Dict[str, Any]):
+            line = json.dumps(record, ensure_ascii=False) + '\n'
+            if path == '-':
+                sys.stderr.write(line)
+                return
+            # Одна короткая запись в режиме append - строки разных процессов не смешиваются
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(line)
+        return write
+    
+    @classmethod
+    def _active_hooks(cls) -> List[Callable[[Dict[str, Any]], None]]:
+        if cls._env_hooks is None:
+            cls._env_hooks = []
+            jsonl_path = os.environ.get(cls.ENV_JSONL)
+            if jsonl_path:
+                cls._env_hooks.append(cls._jsonl_writer(jsonl_path))
+            hook_path = os.environ.get(cls.ENV_HOOK)
+            if hook_path:
+                try:
+                    module_name, _, function_name = hook_path.partition(':')
+                    module = importlib.import_module(module_name)
+                    cls._env_hooks.append(getattr(module, function_name))
+                except Exception as e:
+                    print(f"⚠️  Не удалось подключить обработчик метрик {hook_path}: {e}")
+        return cls._hooks + cls._env_hooks
+    
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """Замеряет блок кода как фазу; в возвращаемый словарь можно дописать счетчики"""
+        hooks = cls._active_hooks()
+        if not hooks:
+            yield fields
+            return
+        
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield fields
+        except BaseException as e:
+            fields['error'] = str(e)
+            raise
+        finally:
+            record = {
+                'ts': round(time.time(), 3),
+                'pid': os.getpid(),
+                'phase': name,
+                'wall_s': round(time.perf_counter() - wall_started, 6),
+                'cpu_s': round(time.process_time() - cpu_started, 6),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            record.update(fields)
+            for hook in hooks:
+                try:
+                    hook(record)
+                except Exception as e:
+                    print(f"⚠️  Ошибка обработчика метрик: {e}")
+
+
+def format_cell(value: Any) -> str:
+    """Приводит значение ячейки к строке для вывода (None - пустая ячейка)"""
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+class RowSource:
+    """Ленивый переиспользуемый источник строк таблицы
+    
+    Каждый проход заново открывает файл через фабрику итераторов, поэтому
+    в памяти одновременно находится только текущая строка. Количество строк
+    вычисляется отдельным проходом при первом обращении к len() и кэшируется.
+    
+    raw=True означает, что фабрика отдает исходные значения ячеек (числа, None,
+    даты): при обычной итерации они приводятся к строкам, а iter_raw() отдает
+    их как есть, чтобы ColumnarTable форматировал каждое значение один раз.
+    
+    path и row_overhead (байт разметки на строку помимо текста ячеек: кавычки,
+    разделители, ключи JSON) позволяют оценить количество строк по размеру
+    файла без полного прохода (estimate_len), estimate - готовая оценка
+    количества строк (например, объявленный размер листа Excel). sampler(limit)
+    отдает до limit строк из разных мест файла, не читая его целиком (см. sample).
+    
+    ragged=True означает, что строки могут быть длиннее списка колонок: ширину
+    таблицы определяет ColumnarTable при построении, а для потокового вывода
+    ее находит отдельный проход padded().
+    """
+    
+    def __init__(self, factory: Callable[[], Iterator[List[Any]]], count: Optional[int] = None,
+                 raw: bool = False, path: Optional[str] = None, row_overhead: int = 0,
+                 sampler: Optional[Callable[[int], List[List[Any]]]] = None,
+                 estimate: Optional[int] = None, ragged: bool = False):
+        self._factory = factory
+        self._count = count
+        self._raw = raw
+        self._path = path
+        self._row_overhead = row_overhead
+        self._sampler = sampler
+        self._estimate = estimate
+        self.ragged = ragged
+    
+    def __iter__(self) -> Iterator[List[str]]:
+        if self._raw:
+            return ([format_cell(value) for value in row] for row in self._factory())
+        return self._factory()
+    
+    def iter_raw(self) -> Iterator[List[Any]]:
+        """Итерирует строки с исходными значениями ячеек"""
+        return self._factory()
+    
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = sum(1 for _ in self._factory())
+        return self._count
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def padded(self, columns: List[str]) -> Tuple[List[str], "RowSource"]:
+        """Для ragged-источника находит ширину и количество строк одним проходом
+        
+        Возвращает колонки, дополненные пустыми именами до самой длинной строки,
+        и источник, дополняющий строки до этой ширины. Остальные источники
+        возвращаются как есть.
+        """
+        if not self.ragged:
+            return columns, self
+        width = len(columns)
+        count = 0
+        for row in self._factory():
+            if len(row) > width:
+                width = len(row)
+            count += 1
+        factory = self._factory
+        return (DataReader._pad_row(list(columns), width),
+                RowSource(lambda: (DataReader._pad_row(row, width) for row in factory()),
+                          count=count, raw=self._raw))
+    
+    def known_len(self) -> Optional[int]:
+        """Количество строк, если оно уже известно, иначе None (без прохода по файлу)"""
+        return self._count
+    
+    def is_empty(self) -> bool:
+        """Проверяет, есть ли строки, читая только первую строку источника"""
+        if self._count is not None:
+            return self._count == 0
+        rows = self._factory()
+        try:
+            return next(rows, None) is None
+        finally:
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+    
+    def sample(self, limit: int) -> List[List[str]]:
+        """Возвращает выборку до limit строк со значениями, приведенными к строкам
+        
+        Половина выборки - начало источника, половина - строки из разных мест
+        файла (если задан sampler), чтобы в нее попали и значения из конца
+        файла. Меньше limit строк выборка содержит, только если это все строки.
+        """
+        rows = iter(self)
+        try:
+            if self._sampler is None:
+                return list(islice(rows, limit))
+            head = list(islice(rows, limit - limit // 2))
+            if len(head) < limit - limit // 2:
+                return head
+            spread = [[format_cell(value) for value in row] for row in self._sampler(limit // 2)]
+            # Если в разных местах файла набралось меньше строк, добираем из начала
+            return head + spread + list(islice(rows, limit - len(head) - len(spread)))
+        finally:
+            close = getattr(rows, 'close', None)
+            if close is not None:
+                close()
+    
+    def estimate_len(self, sample: List[List[str]], sample_limit: int) -> int:
+        """Оценивает количество строк по размеру файла и средней длине строк выборки
+        
+        sample - выборка источника (sample), не более sample_limit строк. Если
+        выборка короче лимита, в ней весь файл; если количество уже известно
+        или файл неизвестен, возвращает len().
+        """
+        if self._count is not None:
+            return self._count
+        if len(sample) < sample_limit:
+            return len(sample)
+        if self._estimate is not None:
+            return max(len(sample), self._estimate)
+        if self._path is None:
+            return len(self)
+        size = os.path.getsize(self._path)
+        sample_bytes = sum(len(value.encode('utf-8')) for row in sample for value in row)
+        row_bytes = sample_bytes / len(sample) + self._row_overhead
+        return max(len(sample), round(size / row_bytes))
+
+
+class ColumnarTable:
+    """Компактная колоночная таблица со словарным кодированием
+    
+    Каждая колонка хранит массив целочисленных кодов и словарь различных
+    строковых значений. Повторяющиеся значения (статус, регион, валюта)
+    хранятся один раз, а форматирование ячейки выполняется один раз на
+    различное значение, а не на каждую ячейку. Колонки, где почти все
+    значения различны (идентификаторы, суммы), словарь только увеличил бы,
+    поэтому они хранятся построчно списком строк. Итерация отдает строки
+    списками строк, как list-of-lists, поэтому таблица подходит везде,
+    где ожидаются строки таблицы.
+    """
+    
+    # Доля различных значений, начиная с которой колонка хранится построчно,
+    # и после скольких строк это проверяется при построении
+    PLAIN_RATIO = 0.5
+    PLAIN_CHECK_ROWS = 4096
+    
+    def __init__(self, columns: List[str], grow: bool = False):
+        """grow=True - строки длиннее колонок добавляют колонки с пустым именем"""
+        self.columns = list(columns)
+        self._grow = grow
+        width = len(self.columns)
+        # None вместо массива кодов - колонка хранится построчно в _values
+        self._codes: List[Optional[array]] = [array('I') for _ in range(width)]
+        self._values: List[List[str]] = [[] for _ in range(width)]
+        # Код по строковому значению и по исходному значению (с учетом типа);
+        # нужны только при построении и удаляются в freeze()
+        self._text_index: Optional[List[Dict[str, int]]] = [{} for _ in range(width)]
+        self._raw_index: Optional[List[Dict[Any, int]]] = [{} for _ in range(width)]
+        self._row_count = 0
+    
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: Iterable[List[Any]]) -> "ColumnarTable":
+        """Строит таблицу за один проход по строкам (RowSource читается без форматирования)"""
+        if isinstance(rows, ColumnarTable):
+            return rows
+        if isinstance(rows, RowSource):
+            table = cls(columns, grow=rows.ragged)
+            table.extend(rows.iter_raw())
+        else:
+            table = cls(columns)
+            table.extend(rows)
+        table.freeze()
+        return table
+    
+    def _encode(self, index: int, value: Any) -> int:
+        """Возвращает код значения в колонке, добавляя его в словарь при первом появлении"""
+        if value.__class__ is str:
+            # Строки (CSV, TXT, Word) не требуют форматирования - только поиск в словаре
+            text_index = self._text_index[index]
+            code = text_index.get(value)
+            if code is None:
+                values = self._values[index]
+                code = text_index[value] = len(values)
+                values.append(value)
+            return code
+        
+        raw_index = self._raw_index[index]
+        # Тип входит в ключ: иначе 1, 1.0 и True попали бы в один код
+        key = (value.__class__, value)
+        try:
+            code = raw_index.get(key)
+        except TypeError:
+            # Нехешируемые значения (списки и словари из JSON) кодируются по тексту
+            key = format_cell(value)
+            code = raw_index.get(key)
+        if code is None:
+            text = format_cell(value)
+            text_index = self._text_index[index]
+            code = text_index.get(text)
+            if code is None:
+                values = self._values[index]
+                code = text_index[text] = len(values)
+                values.append(text)
+            raw_index[key] = code
+        return code
+    
+    def append(self, row: List[Any]):
+        """Добавляет строку, обрезая или дополняя ее пустыми ячейками до ширины таблицы"""
+        if self._text_index is None:
+            raise ValueError("таблица заморожена и доступна только для чтения")
+        width = len(self._codes)
+        if self._grow and len(row) > width:
+            # Новые колонки: у предыдущих строк в них пустое значение с кодом 0
+            for _ in range(len(row) - width):
+                self.columns.append('')
+                self._codes.append(array('I', [0]) * self._row_count)
+                self._values.append([''])
+                self._text_index.append({'': 0})
+                self._raw_index.append({})
+            width = len(row)
+        for index in range(width):
+            value = row[index] if index < len(row) else ''
+            codes = self._codes[index]
+            if codes is None:
+                self._values[index].append(format_cell(value))
+            else:
+                codes.append(self._encode(index, value))
+        self._row_count += 1
+        if self._row_count == self.PLAIN_CHECK_ROWS:
+            self._store_plain_columns()
+    
+    def extend(self, rows: Iterable[List[Any]]):
+        """Добавляет строки из итерируемого объекта"""
+        for row in rows:
+            self.append(row)
+    
+    def _store_plain_columns(self):
+        """Переводит колонки с долей различных значений от PLAIN_RATIO в построчное хранение"""
+        for index, codes in enumerate(self._codes):
+            values = self._values[index]
+            if codes is not None and len(values) >= self.PLAIN_RATIO * self._row_count:
+                self._values[index] = [values[code] for code in codes]
+                self._codes[index] = None
+                self._text_index[index] = {}
+                self._raw_index[index] = {}
+    
+    def freeze(self):
+        """Завершает построение: удаляет индексы значений, нужные только append"""
+        if self._text_index is not None:
+            self._store_plain_columns()
+            self._text_index = None
+            self._raw_index = None
+    
+    def map_values(self, func: Callable[[str], str]) -> "ColumnarTable":
+        """Возвращает таблицу с преобразованными значениями
+        
+        func вызывается один раз на различное значение; массивы кодов общие
+        с исходной таблицей, поэтому результат предназначен только для чтения.
+        """
+        memo: Dict[str, str] = {}
+        
+        def convert(value: str) -> str:
+            result = memo.get(value)
+            if result is None:
+                result = memo[value] = func(value)
+            return result
+        
+        table = ColumnarTable.__new__(ColumnarTable)
+        table.columns = self.columns
+        table._codes = self._codes
+        # Для построчных колонок словарь запоминания не нужен: значения почти не повторяются
+        table._values = [[convert(value) for value in values] if codes is not None else list(map(func, values))
+                         for codes, values in zip(self._codes, self._values)]
+        table._text_index = None
+        table._raw_index = None
+        table._row_count = self._row_count
+        return table
+    
+    def distinct(self, index: int) -> List[str]:
+        """Различные значения колонки в порядке первого появления"""
+        if self._codes[index] is None:
+            return list(dict.fromkeys(self._values[index]))
+        return self._values[index]
+    
+    def _decode(self, start: int, stop: int, step: int = 1) -> Iterator[List[str]]:
+        """Декодирует строки диапазона в списки строк"""
+        if not self._codes:
+            return ([] for _ in range(start, stop, step))
+        columns = [values[start:stop:step] if codes is None
+                   else map(values.__getitem__, memoryview(codes)[start:stop:step])
+                   for codes, values in zip(self._codes, self._values)]
+        return map(list, zip(*columns))
+    
+    def __iter__(self) -> Iterator[List[str]]:
+        return self._decode(0, self._row_count)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return list(self._decode(*item.indices(self._row_count)))
+        if item < 0:
+            item += self._row_count
+        if not 0 <= item < self._row_count:
+            raise IndexError("индекс строки вне диапазона")
+        return [values[item] if codes is None else values[codes[item]]
+                for values, codes in zip(self._values, self._codes)]
+    
+    def __len__(self) -> int:
+        return self._row_count
+    
+    def __bool__(self) -> bool:
+        return self._row_count > 0
+    
+    def memory_bytes(self) -> int:
+        """Приблизительный объем памяти кодов, словарей и построчных колонок (без накладных расходов dict)"""
+        total = 0
+        for codes, values in zip(self._codes, self._values):
+            if codes is None:
+                total += 8 * len(values)  # указатели списка
+            else:
+                total += codes.itemsize * len(codes)
+            total += sum(sys.getsizeof(value) for value in values)
+        return total
+
+
+class DataReader:
+    """Класс для чтения различных типов файлов данных
+    
+    Методы stream_* возвращают (колонки, RowSource) и читают файл лениво,
+    read_table читает файл за один проход в компактную ColumnarTable,
+    методы read_* сохранены для совместимости и возвращают полные списки.
+    """
+    
+    # Сколько первых записей JSON просматривается для определения колонок
+    JSON_SAMPLE_RECORDS = 100
+    
+    # Размер блока (в символах) при инкрементальном разборе JSON
+    JSON_READ_BLOCK = 64 * 1024
+    
+    # Размер блока (в байтах) при чтении TXT через mmap
+    TXT_READ_BLOCK = 1024 * 1024
+    
+    # Параллельный разбор CSV: размер диапазона для одного воркера и минимальный
+    # размер файла, начиная с которого разбор распараллеливается автоматически
+    CSV_RANGE_BYTES = 8 * 1024 * 1024
+    CSV_PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+    
+    # Сколько первых строк параллельного CSV отдается без запуска пула (выборки)
+    CSV_HEAD_ROWS = 1000
+    
+    # Из скольких мест файла берутся строки выборки CSV (см. _sample_csv)
+    CSV_SAMPLE_POINTS = 8
+    
+    # Размер блока (в байтах) при поиске границы записи CSV
+    CSV_SCAN_BLOCK = 64 * 1024
+    
+    # Кандидаты в разделители TXT (в порядке предпочтения) и число строк для их определения
+    TXT_SEPARATORS = ('\t', ';', ',', '|')
+    TXT_SNIFF_LINES = 100
+    
+    @staticmethod
+    def _pad_row(row: List[str], width: int) -> List[str]:
+        """Дополняет строку пустыми ячейками до нужной ширины"""
+        if len(row) < width:
+            return row + [''] * (width - len(row))
+        return row
+    
+    @staticmethod
+    def stream(file_path: str, file_type: str, separator: Optional[str] = None,
+               workers: Optional[int] = None) -> Tuple[List[str], RowSource]:
+        """Открывает файл потоковым читателем в зависимости от типа файла
+        
+        workers - число процессов для разбора CSV (см. DataReader.stream_csv).
+        """
+        if file_type == 'CSV файл':
+            return DataReader.stream_csv(file_path, workers)
+        elif file_type == 'JSON файл':
+            return DataReader.stream_json(file_path)
+        elif file_type == 'NDJSON файл':
+            return DataReader.stream_ndjson(file_path)
+        elif file_type.startswith('Excel'):
+            return DataReader.stream_excel(file_path)
+        elif file_type.startswith('Word'):
+            return DataReader.stream_word(file_path)
+        elif file_type == 'Текстовый файл':
+            return DataReader.stream_txt(file_path, separator)
+        raise Exception(f"Неподдерживаемый тип файла: {file_type}")
+    
+    @staticmethod
+    def read_table(file_path: str, file_type: str, separator: Optional[str] = None,
+                   workers: Optional[int] = None) -> Tuple[List[str], ColumnarTable]:
+        """Читает файл за один проход в колоночную таблицу со словарным кодированием"""
+        columns, rows = DataReader.stream(file_path, file_type, separator, workers)
+        table = ColumnarTable.from_rows(columns, rows)
+        return table.columns, table
+    
+    @staticmethod
+    def stream_csv(file_path: str, workers: Optional[int] = None) -> Tuple[List[str], RowSource]:
+        """Потоково читает CSV файл
+        
+        workers > 1 - разбор в нескольких процессах (см. _stream_csv_parallel).
+        По умолчанию файлы от CSV_PARALLEL_MIN_BYTES разбираются на всех ядрах.
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                columns = next(csv.reader(file), [])
+            
+            if workers is None:
+                large = os.path.getsize(file_path) >= DataReader.CSV_PARALLEL_MIN_BYTES
+                workers = (os.cpu_count() or 1) if large else 1
+            if workers > 1:
+                return columns, DataReader._stream_csv_parallel(file_path, workers)
+        except Exception as e:
+            raise Exception(f"Ошибка чтения CSV файла: {e}")
+        
+        def iter_rows() -> Iterator[List[str]]:
+            try:
+                with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                    reader = csv.reader(file)
+                    next(reader, None)  # заголовки
+                    yield from reader
+            except Exception as e:
+                raise Exception(f"Ошибка чтения CSV файла: {e}")
+        
+        # Разделители колонок и перевод строки
+        return columns, RowSource(iter_rows, path=file_path, row_overhead=max(len(columns), 1),
+                                  sampler=lambda limit: DataReader._sample_csv(file_path, limit))
+    
+    @staticmethod
+    def _sample_csv(file_path: str, limit: int) -> List[List[str]]:
+        """Возвращает до limit записей CSV из CSV_SAMPLE_POINTS мест файла без чтения его целиком
+        
+        От каждой точки чтение начинается со следующего перевода строки. Если
+        точка попала внутрь многострочного поля в кавычках, строки выборки
+        могут быть разобраны неверно - для оценки ширин колонок это допустимо.
+        """
+        points = DataReader.CSV_SAMPLE_POINTS
+        per_point = -(-limit // points)
+        rows: List[List[str]] = []
+        try:
+            size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as file:
+                header_end = DataReader._csv_record_end(file, 0, False)
+                for point in range(1, points + 1):
+                    start = DataReader._csv_record_end(
+                        file, header_end + (size - header_end) * point // (points + 1), False)
+                    file.seek(start)
+                    block = file.read(DataReader.CSV_SCAN_BLOCK)
+                    records = list(csv.reader(io.StringIO(block.decode('utf-8', errors='ignore'),
+                                                          newline='')))
+                    if start + len(block) < size:
+                        records = records[:-1]  # последняя запись блока может быть обрезана
+                    rows.extend(records[:per_point])
+        except Exception as e:
+            raise Exception(f"Ошибка чтения CSV файла: {e}")
+        return rows[:limit]
+    
+    @staticmethod
+    def _csv_record_end(file: io.BufferedReader, pos: int, inside: bool) -> int:
+        """Возвращает смещение начала первой записи CSV после позиции pos
+        
+        inside - находится ли pos внутри поля в кавычках. Перевод строки
+        завершает запись, только если кавычек с начала поля было четное число
+        (экранированная кавычка "" не меняет четность).
+        """
+        file.seek(pos)
+        while True:
+            block = file.read(DataReader.CSV_SCAN_BLOCK)
+            if not block:
+                return pos
+            offset = 0
+            newline = block.find(b'\n')
+            while newline >= 0:
+                inside ^= block.count(b'"', offset, newline) & 1
+                if not inside:
+                    return pos + newline + 1
+                offset = newline + 1
+                newline = block.find(b'\n', offset)
+            inside ^= block.count(b'"', offset) & 1
+            pos += len(block)
+    
+    @staticmethod
+    def split_csv_ranges(file_path: str, workers: int) -> Tuple[List[Tuple[int, int]], int]:
+        """Делит CSV файл после заголовка на диапазоны байт по границам записей
+        
+        Файл режется на куски по CSV_RANGE_BYTES, воркеры параллельно считают в
+        них кавычки, по четности которых для каждого куска известно, начинается
+        ли он внутри поля в кавычках. От этого места ищется первый перевод
+        строки вне кавычек - он и становится границей диапазона. Тем же проходом
+        считаются переводы строк вне кавычек, то есть количество записей.
+        
+        Возвращает (диапазоны, количество записей без заголовка).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as file:
+            header_end = DataReader._csv_record_end(file, 0, False)
+            file.seek(size - 1)
+            unterminated = size > header_end and file.read(1) != b'\n'
+        
+        starts = list(range(header_end, size, DataReader.CSV_RANGE_BYTES))
+        ends = starts[1:] + [size]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(_count_csv_quotes, [file_path] * len(starts), starts, ends))
+        
+        # Записи, завершенные в куске: переводы строк после четного числа кавычек
+        # от начала записи, с учетом того, начинается ли кусок внутри кавычек
+        records = int(unterminated)
+        inside = 0
+        for quotes, even_newlines, odd_newlines in counts:
+            records += odd_newlines if inside else even_newlines
+            inside ^= quotes & 1
+        
+        boundaries = [header_end]
+        inside = 0
+        with open(file_path, 'rb') as file:
+            for start, (quotes, _, _) in zip(starts[1:], counts):
+                inside ^= quotes & 1
+                boundary = DataReader._csv_record_end(file, start, bool(inside))
+                # Длинное поле в кавычках может перекрыть несколько кусков
+                if boundary > boundaries[-1]:
+                    boundaries.append(boundary)
+        if boundaries[-1] < size:
+            boundaries.append(size)
+        return list(zip(boundaries, boundaries[1:])), records
+    
+    @staticmethod
+    def _iter_csv_range(file_path: str, start: int, end: int) -> Iterator[List[str]]:
+        """Лениво разбирает записи CSV в диапазоне байт в текущем процессе"""
+        with open(file_path, 'rb') as file:
+            file.seek(start)
+            text = file.read(end - start).decode('utf-8')
+        return csv.reader(io.StringIO(text, newline=''))
+    
+    @staticmethod
+    def _stream_csv_parallel(file_path: str, workers: int) -> RowSource:
+        """Разбирает CSV в пуле процессов по диапазонам байт и отдает строки в исходном порядке
+        
+        Считается, что кавычки встречаются только в полях, заключенных в кавычки
+        (RFC 4180), иначе границы записей определяются неверно. Первые
+        CSV_HEAD_ROWS строк разбираются в текущем процессе: выборки для выбора
+        backend-а и ширин колонок не запускают пул.
+        """
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        ranges, count = DataReader.split_csv_ranges(file_path, workers)
+        print(f"🔄 Параллельный разбор CSV: {len(ranges)} диапазонов, процессов: {workers}")
+        
+        def unpack(result: Tuple[Any, array]) -> Iterator[List[str]]:
+            """Собирает строки диапазона из плоского списка ячеек"""
+            cells, lengths = result
+            if isinstance(cells, str):
+                cells = cells.split('\x00')
+            if lengths and min(lengths) == max(lengths) > 0:
+                return map(list, zip(*[iter(cells)] * lengths[0]))
+            cell_iter = iter(cells)
+            return (list(islice(cell_iter, length)) for length in lengths)
+        
+        def iter_rows() -> Iterator[List[str]]:
+            if not ranges:
+                return
+            try:
+                head = DataReader._iter_csv_range(file_path, *ranges[0])
+                yield from islice(head, DataReader.CSV_HEAD_ROWS)
+                
+                # Нужны все строки: остальные диапазоны разбираются в пуле, пока
+                # текущий процесс дочитывает первый
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    remaining = iter(ranges[1:])
+                    # Ограничиваем число диапазонов в очереди, чтобы не держать все строки в памяти
+                    pending = deque(executor.submit(_parse_csv_range, file_path, start, end)
+                                    for start, end in islice(remaining, workers * 2))
+                    yield from head
+                    while pending:
+                        result = pending.popleft().result()
+                        for start, end in islice(remaining, 1):
+                            pending.append(executor.submit(_parse_csv_range, file_path, start, end))
+                        yield from unpack(result)
+            except Exception as e:
+                raise Exception(f"Ошибка чтения CSV файла: {e}")
+        
+        return RowSource(iter_rows, count=count,
+                         sampler=lambda limit: DataReader._sample_csv(file_path, limit))
+    
+    @staticmethod
+    def _iter_json_values(file_path: str, array: bool) -> Iterator[Any]:
+        """Инкрементально разбирает JSON блоками, не загружая файл целиком
+        
+        array=True - элементы массива верхнего уровня, array=False - поток
+        значений, разделенных пробельными символами (NDJSON, склеенный JSON).
+        """
+        decoder = json.JSONDecoder()
+        whitespace = json.decoder.WHITESPACE
+        
+        with open(file_path, 'r', encoding='utf-8') as file:
+            buffer = ''
+            pos = 0
+            eof = False
+            
+            def read_more() -> bool:
+                """Дочитывает блок, отбрасывая уже разобранную часть буфера"""
+                nonlocal buffer, pos, eof
+                block = file.read(DataReader.JSON_READ_BLOCK)
+                if not block:
+                    eof = True
+                    return False
+                buffer = buffer[pos:] + block
+                pos = 0
+                return True
+            
+            def skip_whitespace() -> bool:
+                """Пропускает пробельные символы, возвращает False в конце файла"""
+                nonlocal pos
+                while True:
+                    pos = whitespace.match(buffer, pos).end()
+                    if pos < len(buffer):
+                        return True
+                    if not read_more():
+                        return False
+            
+            if array:
+                if not skip_whitespace() or buffer[pos] != '[':
+                    raise ValueError("ожидается массив JSON")
+                pos += 1
+                if not skip_whitespace():
+                    raise ValueError("неожиданный конец массива JSON")
+                if buffer[pos] == ']':
+                    return
+            
+            while skip_whitespace():
+                while True:
+                    try:
+                        value, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if read_more():
+                            continue
+                        raise
+                    # Значение может быть обрезано границей блока (например, число)
+                    if end == len(buffer) and not eof and read_more():
+                        continue
+                    break
+                
+                pos = end
+                yield value
+                
+                if array:
+                    if not skip_whitespace():
+                        raise ValueError("неожиданный конец массива JSON")
+                    separator = buffer[pos]
+                    pos += 1
+                    if separator == ']':
+                        return
+                    if separator != ',':
+                        raise ValueError(f"ожидается ',' или ']', получено {separator!r}")
+            
+            if array:
+                # Файл закончился после запятой - массив не дописан
+                raise ValueError("неожиданный конец массива JSON")
+    
+    @staticmethod
+    def _iter_ndjson(file_path: str) -> Iterator[Any]:
+        """Построчно разбирает line-delimited JSON (одна запись на строку)"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    
+    @staticmethod
+    def _stream_json_records(factory: Callable[[], Iterator[Any]], label: str,
+                             path: Optional[str] = None) -> Tuple[List[str], RowSource]:
+        """Строит колонки по первым записям и лениво превращает записи в строки таблицы"""
+        try:
+            sample = list(islice(factory(), DataReader.JSON_SAMPLE_RECORDS))
+        except Exception as e:
+            raise Exception(f"Ошибка чтения {label} файла: {e}")
+        
+        if not sample:
+            return [], RowSource(lambda: iter(()), count=0)
+        
+        if isinstance(sample[0], dict):
+            # Список словарей: объединяем ключи первых записей в порядке появления
+            keys: Dict[str, None] = {}
+            for record in sample:
+                if isinstance(record, dict):
+                    for key in record:
+                        keys.setdefault(key)
+            columns = list(keys)
+            # Ключи в кавычках, двоеточия, запятые, кавычки значений и скобки записи
+            row_overhead = sum(len(key.encode('utf-8')) + 6 for key in columns) + 4
+            
+            def to_row(record: Any) -> List[Any]:
+                if isinstance(record, dict):
+                    return [record.get(col, '') for col in columns]
+                return DataReader._pad_row([record], len(columns))
+        else:
+            # Список списков
+            width = max(len(record) if isinstance(record, list) else 1 for record in sample)
+            columns = [f"Колонка_{i+1}" for i in range(width)]
+            row_overhead = 4 * width + 4
+            
+            def to_row(record: Any) -> List[Any]:
+                cells = record[:width] if isinstance(record, list) else [record]
+                return DataReader._pad_row(list(cells), width)
+        
+        def iter_rows() -> Iterator[List[Any]]:
+            try:
+                for record in factory():
+                    yield to_row(record)
+            except Exception as e:
+                raise Exception(f"Ошибка чтения {label} файла: {e}")
+        
+        # Значения приводятся к строкам при итерации или один раз на значение в ColumnarTable
+        return columns, RowSource(iter_rows, raw=True, path=path, row_overhead=row_overhead)
+    
+    @staticmethod
+    def stream_json(file_path: str) -> Tuple[List[str], RowSource]:
+        """Потоково читает JSON файл
+        
+        Массив верхнего уровня и поток объектов (NDJSON в файле .json) разбираются
+        инкрементально; одиночный объект читается целиком, как и раньше.
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                first_char = file.read(DataReader.JSON_READ_BLOCK).lstrip()[:1]
+        except Exception as e:
+            raise Exception(f"Ошибка чтения JSON файла: {e}")
+        
+        if first_char == '[':
+            return DataReader._stream_json_records(
+                lambda: DataReader._iter_json_values(file_path, array=True), 'JSON', file_path)
+        
+        if first_char == '{':
+            try:
+                values = DataReader._iter_json_values(file_path, array=False)
+                head = next(values, None)
+                has_more = next(values, None) is not None
+            except Exception as e:
+                raise Exception(f"Ошибка чтения JSON файла: {e}")
+            
+            if has_more:
+                # Несколько объектов подряд - это NDJSON
+                return DataReader._stream_json_records(
+                    lambda: DataReader._iter_json_values(file_path, array=False), 'JSON', file_path)
+            
+            # Если это словарь
+            columns = list(head.keys())
+            return columns, RowSource(
+                lambda: ([head[col]] for col in columns),
+                count=len(columns),
+                raw=True
+            )
+        
+        raise Exception("Ошибка чтения JSON файла: Неподдерживаемый формат JSON")
+    
+    @staticmethod
+    def stream_ndjson(file_path: str) -> Tuple[List[str], RowSource]:
+        """Потоково читает NDJSON / JSON Lines файл"""
+        return DataReader._stream_json_records(lambda: DataReader._iter_ndjson(file_path), 'NDJSON', file_path)
+    
+    @staticmethod
+    def _iter_excel(file_path: str, dimensions: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+        """Построчно читает активный лист Excel в режиме read-only с постоянной памятью
+        
+        Отдает исходные значения ячеек (числа, даты, None) без приведения к строкам.
+        В dimensions записывается объявленное в файле число строк листа (max_row).
+        """
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            if dimensions is not None:
+                dimensions['max_row'] = sheet.max_row
+            # Не доверяем объявленным размерам листа (dimension): иначе каждая
+            # строка дополняется пустыми ячейками до заявленной ширины
+            sheet.reset_dimensions()
+            
+            for row in sheet.iter_rows(values_only=True):
+                # Отбрасываем пустые ячейки в конце строки - реальная граница данных
+                end = len(row)
+                while end and row[end - 1] is None:
+                    end -= 1
+                if end:
+                    yield list(row[:end])
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def stream_excel(file_path: str) -> Tuple[List[str], RowSource]:
+        """Потоково читает Excel файл
+        
+        Читается только строка заголовков: строки данных не обрезаются и могут
+        быть длиннее нее (ragged), ширину таблицы определяет ее построение или,
+        для быстрого backend-а, проход RowSource.padded(). Количество строк
+        оценивается по объявленному размеру листа.
+        """
+        def iter_data(dimensions: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+            try:
+                yield from DataReader._iter_excel(file_path, dimensions)
+            except Exception as e:
+                raise Exception(f"Ошибка чтения Excel файла: {e}")
+        
+        dimensions: Dict[str, Any] = {}
+        data = iter_data(dimensions)
+        try:
+            header = next(data, None)
+        finally:
+            data.close()
+        
+        if header is None:
+            return [], RowSource(lambda: iter(()), count=0)
+        
+        columns = [format_cell(cell) for cell in header]
+        declared = dimensions.get('max_row')
+        
+        def iter_rows() -> Iterator[List[Any]]:
+            data = iter_data()
+            next(data, None)  # заголовки
+            yield from data
+        
+        return columns, RowSource(iter_rows, raw=True, ragged=True,
+                                  estimate=declared - 1 if declared else None)
+    
+    # Пространство имен WordprocessingML (в виде, который отдает expat с namespace_separator='}')
+    WORD_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    
+    # Размер блока при потоковом разборе word/document.xml
+    DOCX_READ_BLOCK = 64 * 1024
+    
+    @staticmethod
+    def _iter_docx(file_path: str) -> Iterator[List[str]]:
+        """Потоково разбирает word/document.xml и отдает строки в порядке документа
+        
+        Абзацы вне таблиц делятся по табуляции, каждая строка таблицы w:tbl -
+        отдельная строка данных. Ячейка, объединенная по горизонтали (gridSpan),
+        занимает свою колонку и пустые колонки после нее, объединенная по
+        вертикали (vMerge) повторяет значение верхней ячейки. Вложенные таблицы
+        входят в текст своей ячейки. Дерево документа не строится: разбор идет
+        обработчиками expat, поэтому память не зависит от размера документа.
+        """
+        import zipfile
+        from xml.parsers import expat
+        
+        ns = DataReader.WORD_NS
+        tag_p, tag_r, tag_t = ns + 'p', ns + 'r', ns + 't'
+        tag_tbl, tag_tr, tag_tc = ns + 'tbl', ns + 'tr', ns + 'tc'
+        attr_val = ns + 'val'
+        # Элементы внутри w:r, которые превращаются в символы текста
+        run_chars = {ns + 'tab': '\t', ns + 'br': '\n', ns + 'cr': '\n', ns + 'noBreakHyphen': '-'}
+        
+        state = {'table_depth': 0, 'run_depth': 0, 'in_text': False, 'span': 1, 'continued': False}
+        paragraphs: List[List[str]] = []  # стек абзацев (текстовые поля вкладывают абзацы)
+        cell_texts: List[str] = []
+        row: List[str] = []
+        merged_above: Dict[int, str] = {}
+        ready: List[List[str]] = []
+        
+        def start(name: str, attrs: Dict[str, str]):
+            if name == tag_t:
+                state['in_text'] = True
+            elif name == tag_r:
+                state['run_depth'] += 1
+            elif name in run_chars:
+                # w:tab встречается и в настройках абзаца (позиции табуляции) - учитываем только в тексте
+                if state['run_depth'] and paragraphs:
+                    paragraphs[-1].append(run_chars[name])
+            elif name == tag_p:
+                paragraphs.append([])
+            elif name == tag_tbl:
+                state['table_depth'] += 1
+                if state['table_depth'] == 1:
+                    merged_above.clear()
+            elif state['table_depth'] != 1:
+                return
+            elif name == tag_tr:
+                row.clear()
+            elif name == tag_tc:
+                cell_texts.clear()
+                state['span'] = 1
+                state['continued'] = False
+            elif name == ns + 'gridSpan':
+                state['span'] = max(1, int(attrs.get(attr_val, '1')))
+            elif name == ns + 'vMerge':
+                state['continued'] = attrs.get(attr_val, 'continue') == 'continue'
+            elif name == ns + 'gridBefore':
+                # Пропущенные в начале строки колонки сетки - пустые ячейки
+                row.extend([''] * int(attrs.get(attr_val, '0')))
+        
+        def end(name: str):
+            if name == tag_t:
+                state['in_text'] = False
+            elif name == tag_r:
+                state['run_depth'] -= 1
+            elif name == tag_p:
+                text = ''.join(paragraphs.pop()) if paragraphs else ''
+                if state['table_depth']:
+                    text = text.strip()
+                    if text:
+                        cell_texts.append(text)
+                elif text.strip():
+                    # Разделяем текст по табуляции
+                    cells = [cell.strip() for cell in text.split('\t')]
+                    if len(cells) == 1:
+                        cells = [text.strip()]
+                    ready.append(cells)
+            elif name == tag_tbl:
+                state['table_depth'] -= 1
+            elif state['table_depth'] != 1:
+                return
+            elif name == tag_tc:
+                column = len(row)
+                if state['continued']:
+                    text = merged_above.get(column, '')
+                else:
+                    text = merged_above[column] = '\n'.join(cell_texts)
+                row.append(text)
+                row.extend([''] * (state['span'] - 1))
+            elif name == tag_tr:
+                if any(row):
+                    ready.append(list(row))
+        
+        def characters(data: str):
+            if state['in_text'] and paragraphs:
+                paragraphs[-1].append(data)
+        
+        parser = expat.ParserCreate(namespace_separator='}')
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = characters
+        parser.buffer_text = True
+        
+        with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml_file:
+            while True:
+                block = xml_file.read(DataReader.DOCX_READ_BLOCK)
+                parser.Parse(block, not block)
+                yield from ready
+                ready.clear()
+                if not block:
+                    break
+    
+    @staticmethod
+    def stream_word(file_path: str) -> Tuple[List[str], RowSource]:
+        """Потоково читает Word файл (абзацы и таблицы из word/document.xml)"""
+        def iter_data() -> Iterator[List[str]]:
+            try:
+                yield from DataReader._iter_docx(file_path)
+            except Exception as e:
+                raise Exception(f"Ошибка чтения Word файла: {e}")
+        
+        # Первый проход: только считаем строки и максимальное количество колонок
+        max_cols = 0
+        count = 0
+        for row in iter_data():
+            max_cols = max(max_cols, len(row))
+            count += 1
+        
+        # Создаем заголовки
+        columns = [f"Колонка_{i+1}" for i in range(max_cols)]
+        
+        # Нормализуем данные по мере чтения
+        return columns, RowSource(
+            lambda: (DataReader._pad_row(row, max_cols) for row in iter_data()),
+            count=count
+        )
+    
+    @staticmethod
+    def _iter_mapped_lines(file_path: str) -> Iterator[str]:
+        """Отдает непустые строки TXT файла через mmap блоками по TXT_READ_BLOCK байт
+        
+        Файл не читается в память целиком: блок обрезается по последнему переводу
+        строки и декодируется отдельно, поэтому в памяти одновременно только он.
+        """
+        import mmap
+        
+        with open(file_path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                size = len(mapped)
+                pos = 3 if mapped[:3] == b'\xef\xbb\xbf' else 0  # BOM
+                released = 0
+                while pos < size:
+                    end = min(pos + DataReader.TXT_READ_BLOCK, size)
+                    if end < size:
+                        newline = mapped.rfind(b'\n', pos, end)
+                        # Строка длиннее блока - дочитываем ее до конца
+                        end = newline + 1 if newline >= 0 else mapped.find(b'\n', end) + 1 or size
+                    for line in mapped[pos:end].decode('utf-8').split('\n'):
+                        line = line.strip()
+                        if line:
+                            yield line
+                    pos = end
+                    # Прочитанные страницы больше не нужны - не держим их в памяти процесса
+                    page_end = pos - pos % mmap.PAGESIZE
+                    if page_end > released and hasattr(mapped, 'madvise'):
+                        mapped.madvise(mmap.MADV_DONTNEED, released, page_end - released)
+                        released = page_end
+    
+    @staticmethod
+    def sniff_separator(file_path: str) -> str:
+        """Определяет разделитель колонок TXT файла по первым TXT_SNIFF_LINES строкам
+        
+        Выбирается кандидат, который есть в большинстве строк (при равенстве -
+        встречающийся в них одинаковое число раз чаще); если ни один не подходит,
+        используется табуляция.
+        """
+        lines = list(islice(DataReader._iter_mapped_lines(file_path), DataReader.TXT_SNIFF_LINES))
+        best, best_score = '\t', (0.0, 0.0)
+        for candidate in DataReader.TXT_SEPARATORS:
+            counts = [line.count(candidate) for line in lines]
+            present = sum(1 for count in counts if count)
+            if not present:
+                continue
+            # Доля строк с разделителем, затем доля строк с самым частым числом вхождений
+            mode = max(set(counts) - {0}, key=counts.count)
+            score = (present / len(counts), counts.count(mode) / len(counts))
+            # Разделитель должен встречаться в большинстве строк
+            if score[0] > 0.5 and score > best_score:
+                best, best_score = candidate, score
+        return best
+    
+    @staticmethod
+    def stream_txt(file_path: str, separator: Optional[str] = None) -> Tuple[List[str], RowSource]:
+        """Потоково читает TXT файл через mmap
+        
+        Если разделитель не задан, он определяется по началу файла. Первый проход
+        только считает строки и колонки, короткие строки дополняются пустыми
+        ячейками по мере чтения.
+        """
+        try:
+            if not separator:
+                separator = DataReader.sniff_separator(file_path)
+                print(f"🔎 Разделитель колонок: {separator!r}")
+            
+            # Первый проход: только считаем строки и максимальное количество колонок
+            max_separators = -1
+            count = 0
+            for line in DataReader._iter_mapped_lines(file_path):
+                max_separators = max(max_separators, line.count(separator))
+                count += 1
+        except Exception as e:
+            raise Exception(f"Ошибка чтения TXT файла: {e}")
+        max_cols = max_separators + 1
+        
+        def iter_data() -> Iterator[List[str]]:
+            try:
+                for line in DataReader._iter_mapped_lines(file_path):
+                    yield DataReader._pad_row([cell.strip() for cell in line.split(separator)], max_cols)
+            except Exception as e:
+                raise Exception(f"Ошибка чтения TXT файла: {e}")
+        
+        # Создаем заголовки
+        columns = [f"Колонка_{i+1}" for i in range(max_cols)]
+        
+        return columns, RowSource(iter_data, count=count)
+    
+    @staticmethod
+    def read_csv(file_path: str) -> Tuple[List[str], List[List[str]]]:
+        """Читает CSV файл"""
+        columns, rows = DataReader.stream_csv(file_path)
+        return columns, list(rows)
+    
+    @staticmethod
+    def read_json(file_path: str) -> Tuple[List[str], List[List[str]]]:
+        """Читает JSON файл"""
+        columns, rows = DataReader.stream_json(file_path)
+        return columns, list(rows)
+    
+    @staticmethod
+    def read_excel(file_path: str) -> Tuple[List[str], List[List[str]]]:
+        """Читает Excel файл"""
+        columns, rows = DataReader.stream_excel(file_path)
+        return columns, list(rows)
+    
+    @staticmethod
+    def read_word(file_path: str) -> Tuple[List[str], List[List[str]]]:
+        """Читает Word файл"""
+        columns, rows = DataReader.stream_word(file_path)
+        return columns, list(rows)
+    
+    @staticmethod
+    def read_txt(file_path: str, separator: Optional[str] = None) -> Tuple[List[str], List[List[str]]]:
+        """Читает TXT файл"""
+        columns, rows = DataReader.stream_txt(file_path, separator)
+        return columns, list(rows)
+
+
+def _count_csv_quotes(file_path: str, start: int, end: int) -> Tuple[int, int, int]:
+    """Считает кавычки и переводы строк в диапазоне байт файла (выполняется в процессе-воркере)
+    
+    Возвращает (кавычек, переводов строк после четного числа кавычек от начала
+    диапазона, после нечетного): какие из них завершают записи, зависит от
+    того, начинается ли диапазон внутри поля в кавычках.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    quotes = data.count(b'"')
+    if not quotes:
+        return 0, data.count(b'\n'), 0
+    newlines = [0, 0]
+    parity = 0
+    if quotes < data.count(b'\n'):
+        # Кавычек меньше, чем строк: считаем переводы строк между соседними кавычками
+        pos = 0
+        quote = data.find(b'"')
+        while quote >= 0:
+            newlines[parity] += data.count(b'\n', pos, quote)
+            parity ^= 1
+            pos = quote + 1
+            quote = data.find(b'"', pos)
+        newlines[parity] += data.count(b'\n', pos)
+    else:
+        lines = data.split(b'\n')
+        for line in islice(lines, len(lines) - 1):
+            parity ^= line.count(b'"') & 1
+            newlines[parity] += 1
+    return quotes, newlines[0], newlines[1]
+
+
+def _parse_csv_range(file_path: str, start: int, end: int) -> Tuple[Any, array]:
+    """Разбирает записи CSV в диапазоне байт (выполняется в процессе-воркере)
+    
+    Возвращает ячейки одной строкой через NUL (если NUL в данных нет) и массив
+    длин строк: такой результат передается между процессами на порядок
+    быстрее списка списков.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    cells: List[str] = []
+    lengths = array('I')
+    for row in csv.reader(io.StringIO(text, newline='')):
+        cells.extend(row)
+        lengths.append(len(row))
+    if cells and '\x00' not in text:
+        return '\x00'.join(cells), lengths
+    return cells, lengths
+
+
+# Корень проекта: шрифты и шаблоны ищутся относительно него, а не текущей директории
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS_DIR = os.path.join(BASE_DIR, 'fonts')
+
+# Директория для кэшей между запусками (скомпилированные шаблоны и т.п.)
+CACHE_DIR = os.environ.get('DATAFORGEPDF_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'dataforgepdf'))
+
+# Окружения Jinja2 текущего процесса по директориям шаблонов
+_template_environments: Dict[str, "Environment"] = {}
+
+
+def get_template(template_path: str) -> "Template":
+    """Возвращает скомпилированный шаблон из общего окружения Jinja2 процесса
+    
+    Окружение кэширует шаблон в памяти и перезагружает его при изменении mtime
+    файла, а байткод хранится на диске, поэтому новые процессы (в том числе
+    воркеры пакетного режима) не компилируют шаблон заново.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+    
+    directory, name = os.path.split(os.path.abspath(template_path))
+    environment = _template_environments.get(directory)
+    if environment is None:
+        try:
+            bytecode_dir = os.path.join(CACHE_DIR, 'jinja2')
+            os.makedirs(bytecode_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+        except OSError:
+            # Без доступа на запись работаем только с кэшем в памяти
+            bytecode_cache = None
+        
+        environment = Environment(
+            loader=FileSystemLoader(directory),
+            bytecode_cache=bytecode_cache,
+            auto_reload=True
+        )
+        _template_environments[directory] = environment
+    
+    return environment.get_template(name)
+
+
+class WeasyPrintStyles:
+    """Разобранные стили и общая конфигурация шрифтов WeasyPrint
+    
+    CSS шаблона хранится рядом с ним (template.html -> template.css) и
+    разбирается один раз на процесс вместе с @font-face: шрифты из fonts/
+    разрешаются относительно CSS файла и регистрируются в одной
+    FontConfiguration, которую используют все документы процесса.
+    При изменении CSS файла стили разбираются заново.
+    """
+    
+    # Отключает нумерацию страниц шаблона (фрагменты нумеруются после склейки)
+    NO_PAGE_NUMBERS_CSS = "@page { @bottom-center { content: none } }"
+    
+    # Путь к CSS -> (mtime, FontConfiguration, стили шаблона, стиль без нумерации)
+    _cache: Dict[str, Tuple[Optional[float], Any, List[Any], Any]] = {}
+    
+    @staticmethod
+    def stylesheet_path(template_path: str) -> str:
+        """Возвращает путь к CSS файлу шаблона"""
+        return os.path.splitext(os.path.abspath(template_path))[0] + '.css'
+    
+    @classmethod
+    def get(cls, template_path: str) -> Tuple["FontConfiguration", List["CSS"], "CSS"]:
+        """Возвращает (FontConfiguration, стили шаблона, стиль без нумерации страниц)"""
+        from weasyprint import CSS
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:
+            # WeasyPrint < 53
+            from weasyprint.fonts import FontConfiguration
+        
+        css_path = cls.stylesheet_path(template_path)
+        try:
+            mtime = os.path.getmtime(css_path)
+        except OSError:
+            # Шаблон без отдельного CSS - стили только внутри HTML
+            mtime = None
+        
+        cached = cls._cache.get(css_path)
+        if cached is None or cached[0] != mtime:
+            font_config = FontConfiguration()
+            stylesheets = [CSS(filename=css_path, font_config=font_config)] if mtime is not None else []
+            no_page_numbers = CSS(string=cls.NO_PAGE_NUMBERS_CSS, font_config=font_config)
+            cached = cls._cache[css_path] = (mtime, font_config, stylesheets, no_page_numbers)
+        return cached[1], cached[2], cached[3]
+    
+    @classmethod
+    def render(cls, template_path: str, html_content: str, page_numbers: bool = True) -> "Document":
+        """Верстает HTML со стилями шаблона; относительные ссылки - от файла шаблона"""
+        from weasyprint import HTML
+        
+        font_config, stylesheets, no_page_numbers = cls.get(template_path)
+        if not page_numbers:
+            stylesheets = stylesheets + [no_page_numbers]
+        html = HTML(string=html_content, base_url=os.path.abspath(template_path))
+        return html.render(stylesheets=stylesheets, font_config=font_config)
+
+
+def _render_weasyprint_chunk(template_path: str, context: Dict[str, Any], chunk_path: str) -> str:
+    """Рендерит фрагмент таблицы в отдельный PDF (выполняется в процессе-воркере)"""
+    template = get_template(template_path)
+    document = WeasyPrintStyles.render(template_path, template.render(**context),
+                                       page_numbers=context.get('page_numbers', True))
+    document.write_pdf(chunk_path)
+    return chunk_path
+
+
+class FontRegistry:
+    """Реестр шрифтов ReportLab с поддержкой кириллицы
+    
+    Цепочка fallback разрешается один раз на процесс: TTF файлы разбираются
+    при первом обращении, объекты TTFont кэшируются, а выбранный шрифт
+    используется всеми последующими рендерами.
+    """
+    
+    # (имя шрифта в ReportLab, файл в fonts/, описание для сообщений)
+    FALLBACK_CHAIN = [
+        ('DejaVuSans', 'DejaVuSans.ttf', 'шрифт DejaVu Sans с полной поддержкой кириллицы'),
+        ('ArialUnicode', 'Arial Unicode.ttf', 'системный шрифт Arial Unicode MS с полной поддержкой кириллицы'),
+        ('Roboto', 'Roboto-Regular.ttf', 'шрифт Roboto с поддержкой кириллицы'),
+        ('RobotoBold', 'Roboto-Bold.ttf', 'шрифт Roboto Bold с поддержкой кириллицы'),
+    ]
+    
+    # Встроенный шрифт ReportLab, если ни один TTF не загрузился
+    DEFAULT_FONT = 'Helvetica'
+    
+    _fonts: Dict[str, "TTFont"] = {}
+    _font_name: Optional[str] = None
+    
+    @classmethod
+    def get_font(cls, font_name: str) -> Optional["TTFont"]:
+        """Возвращает загруженный TTFont или None, если шрифт недоступен"""
+        cls.get_font_name()
+        return cls._fonts.get(font_name)
+    
+    @classmethod
+    def get_font_name(cls) -> str:
+        """Возвращает имя лучшего доступного шрифта, загружая цепочку при первом вызове"""
+        if cls._font_name is None:
+            cls._font_name = cls._load_chain()
+        return cls._font_name
+    
+    @classmethod
+    def _load_chain(cls) -> str:
+        """Загружает первый доступный шрифт из цепочки fallback"""
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        
+        errors = []
+        for font_name, font_file, description in cls.FALLBACK_CHAIN:
+            font_path = os.path.join(FONTS_DIR, font_file)
+            try:
+                font = TTFont(font_name, font_path)
+                pdfmetrics.registerFont(font)
+            except Exception as e:
+                errors.append((description, e))
+                continue
+            
+            cls._fonts[font_name] = font
+            print(f"✅ Используем {description}")
+            return font_name
+        
+        print(f"⚠️  Используем встроенный шрифт {cls.DEFAULT_FONT} (кириллица может не отображаться)")
+        for description, error in errors:
+            print(f"   Ошибка ({description}): {error}")
+        return cls.DEFAULT_FONT
+
+
+class ColumnWidthPlanner:
+    """Планировщик ширин колонок таблицы
     
-    # Импортируем ReportLab в любом случае
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib import colors
-        REPORTLAB_AVAILABLE = True
+    Вместо измерения каждой ячейки (так поступают Table без colWidths в ReportLab
+    и автоматическая раскладка таблиц в WeasyPrint) измеряется выборка строк.
+    Ширины символов кэшируются для каждой пары (шрифт, размер), поэтому
+    измерение строки сводится к сумме значений из словаря.
+    """
+    
+    # Сколько строк данных измерять для оценки ширины колонок
+    SAMPLE_ROWS = 200
+    
+    # Минимальная ширина колонки в пунктах (без отступов)
+    MIN_WIDTH = 24
+    
+    # Ширины символов: (шрифт, размер) -> {символ: ширина в пунктах}
+    _glyph_widths: Dict[Tuple[str, float], Dict[str, float]] = {}
+    
+    @classmethod
+    def text_width(cls, text: str, font_name: str, font_size: float) -> float:
+        """Возвращает ширину строки в пунктах по кэшу ширин символов"""
+        widths = cls._glyph_widths.get((font_name, font_size))
+        if widths is None:
+            widths = cls._glyph_widths[(font_name, font_size)] = {}
         
-        # Пытаемся загрузить шрифт Roboto для поддержки кириллицы
         try:
-            roboto_path = os.path.join(os.path.dirname(__file__), '..', 'fonts', 'Roboto-Regular.ttf')
-            if os.path.exists(roboto_path):
-                pdfmetrics.registerFont(TTFont('Roboto', roboto_path))
-                ROBOTO_AVAILABLE = True
+            # Быстрый путь: все символы уже измерены
+            return sum(map(widths.__getitem__, text))
+        except KeyError:
+            pass
+        
+        total = 0.0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                width = widths[char] = cls._measure_glyph(char, font_name, font_size)
+            total += width
+        return total
+    
+    @staticmethod
+    def _measure_glyph(char: str, font_name: str, font_size: float) -> float:
+        """Измеряет ширину одного символа (без ReportLab - по средней ширине)"""
+        if REPORTLAB_AVAILABLE:
+            from reportlab.pdfbase import pdfmetrics
+            try:
+                return pdfmetrics.stringWidth(char, font_name, font_size)
+            except Exception:
+                pass
+        return font_size * 0.55
+    
+    @classmethod
+    def fit_prefix(cls, text: str, width: float, font_name: str, font_size: float) -> int:
+        """Возвращает количество первых символов строки, помещающихся в ширину"""
+        widths = cls._glyph_widths.get((font_name, font_size))
+        if widths is None:
+            widths = cls._glyph_widths[(font_name, font_size)] = {}
+        
+        total = 0.0
+        for count, char in enumerate(text):
+            glyph_width = widths.get(char)
+            if glyph_width is None:
+                glyph_width = widths[char] = cls._measure_glyph(char, font_name, font_size)
+            total += glyph_width
+            if total > width:
+                return count
+        return len(text)
+    
+    @classmethod
+    def sample_rows(cls, rows: Iterable[List[str]]) -> List[List[str]]:
+        """Возвращает выборку строк: равномерную для списков, по всему файлу для
+        RowSource с sampler-ом, первые строки для остальных потоков"""
+        if isinstance(rows, (list, ColumnarTable)):
+            step = max(1, len(rows) // cls.SAMPLE_ROWS)
+            return rows[::step][:cls.SAMPLE_ROWS]
+        if isinstance(rows, RowSource):
+            return rows.sample(cls.SAMPLE_ROWS)
+        return list(islice(rows, cls.SAMPLE_ROWS))
+    
+    @classmethod
+    def plan(cls, columns: List[str], rows: Iterable[List[str]], available_width: float,
+             font_name: str, font_size: float, header_font_size: float,
+             padding: float) -> List[float]:
+        """Рассчитывает ширины колонок в пунктах, не превышающие available_width
+        
+        Ширина колонки - наибольшая ширина заголовка или значения в выборке
+        плюс отступы ячейки. Если сумма не помещается, колонки пропорционально
+        сужаются (не меньше MIN_WIDTH).
+        """
+        if not columns:
+            return []
+        
+        widths = [cls.text_width(str(column), font_name, header_font_size) for column in columns]
+        for row in cls.sample_rows(rows):
+            for index, value in enumerate(row[:len(widths)]):
+                width = cls.text_width(str(value), font_name, font_size)
+                if width > widths[index]:
+                    widths[index] = width
+        
+        widths = [max(width, cls.MIN_WIDTH) + padding for width in widths]
+        total = sum(widths)
+        if total > available_width:
+            # Сужаем только ту часть, что превышает минимум, чтобы узкие колонки не пропадали
+            minimum = cls.MIN_WIDTH + padding
+            spare = total - minimum * len(widths)
+            room = max(available_width - minimum * len(widths), 0)
+            scale = room / spare if spare else 0
+            widths = [minimum + (width - minimum) * scale for width in widths]
+        return widths
+
+
+class _LazyStory(list):
+    """Список flowable-ов для ReportLab, пополняемый из генератора по мере верстки
+    
+    SimpleDocTemplate.build обрабатывает story с начала, удаляя сверстанные
+    элементы, и перед каждым шагом проверяет len(). Здесь len() подкачивает
+    следующие элементы, поэтому в памяти находятся только ближайшие фрагменты.
+    """
+    
+    # Сколько элементов держать впереди (build заглядывает на следующий элемент)
+    LOOKAHEAD = 2
+    
+    def __init__(self, head: List[Any], source: Iterator[Any]):
+        super().__init__(head)
+        self._source: Optional[Iterator[Any]] = source
+    
+    def __len__(self) -> int:
+        while self._source is not None and list.__len__(self) < self.LOOKAHEAD:
+            item = next(self._source, None)
+            if item is None:
+                self._source = None
             else:
-                ROBOTO_AVAILABLE = False
-        except:
-            ROBOTO_AVAILABLE = False
-    except ImportError:
-        REPORTLAB_AVAILABLE = False
-except ImportError as e:
-    print(f"Ошибка импорта: {e}")
-    print("Установите зависимости: pip install -r requirements.txt")
-    sys.exit(1)
+                self.append(item)
+        return list.__len__(self)
 
 
-class DataReader:
-    """Класс для чтения различных типов файлов данных"""
+class PDFObjectWriter:
+    """Последовательная запись объектов PDF 1.5 с потоками объектов и xref-потоком
     
-    @staticmethod
-    def read_csv(file_path: str) -> Tuple[List[str], List[List[str]]]:
-        """Читает CSV файл"""
+    Объекты без данных (словари страниц, шрифтов, дерево страниц) собираются
+    пачками по OBJECTS_PER_STREAM в сжатые потоки объектов /ObjStm, потоки
+    данных пишутся напрямую со сжатием FlateDecode, а таблица перекрестных
+    ссылок - сжатым xref-потоком. В памяти остаются только смещения объектов
+    и текущая пачка.
+    """
+    
+    OBJECTS_PER_STREAM = 100
+    
+    def __init__(self, file, object_count: int = 0):
+        import zlib
+        
+        self._file = file
+        self._compress = zlib.compress
+        self._position = 0
+        # Для каждого объекта (индекс - номер объекта минус 1): смещение в файле
+        # или номер потока объектов и индекс в нем (-1 - объект записан напрямую)
+        self._offsets = array('Q', bytes(8 * object_count))
+        self._stream_index = array('i', [-1]) * object_count
+        self._batch: List[Tuple[int, bytes]] = []
+        
+        self._write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._position += len(data)
+    
+    def allocate(self) -> int:
+        """Резервирует номер объекта"""
+        self._offsets.append(0)
+        self._stream_index.append(-1)
+        return len(self._offsets)
+    
+    def write_object(self, number: int, body: bytes):
+        """Записывает объект напрямую (обязательно для потоков данных)"""
+        self._offsets[number - 1] = self._position
+        self._write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    
+    def write_stream(self, number: int, data: bytes, entries: bytes = b""):
+        """Записывает поток данных со сжатием FlateDecode"""
+        data = self._compress(data)
+        self.write_object(number, b"<< /Length %d /Filter /FlateDecode %s>>\nstream\n" % (len(data), entries)
+                          + data + b"\nendstream")
+    
+    def write_compressed(self, number: int, body: bytes):
+        """Добавляет объект без потока данных в текущий поток объектов"""
+        self._batch.append((number, body))
+        if len(self._batch) >= self.OBJECTS_PER_STREAM:
+            self._flush_batch()
+    
+    def _flush_batch(self):
+        if not self._batch:
+            return
+        header = []
+        offset = 0
+        for number, body in self._batch:
+            header.append(b"%d %d" % (number, offset))
+            offset += len(body) + 1
+        header = b" ".join(header) + b"\n"
+        
+        stream_number = self.allocate()
+        self.write_stream(stream_number, header + b"\n".join(body for _, body in self._batch),
+                          b"/Type /ObjStm /N %d /First %d " % (len(self._batch), len(header)))
+        for index, (number, _) in enumerate(self._batch):
+            self._offsets[number - 1] = stream_number
+            self._stream_index[number - 1] = index
+        self._batch = []
+    
+    def finish(self, trailer: bytes):
+        """Дописывает оставшиеся объекты и xref-поток; trailer - записи словаря трейлера (/Root ...)"""
+        self._flush_batch()
+        
+        xref_number = self.allocate()
+        xref_position = self._offsets[xref_number - 1] = self._position
+        # Ширина поля смещения (или номера потока объектов) в байтах
+        width = max(1, (max(self._offsets).bit_length() + 7) // 8)
+        entries = [b"\x00" + bytes(width) + b"\xff\xff"]
+        for offset, index in zip(self._offsets, self._stream_index):
+            if index >= 0:
+                entries.append(b"\x02" + offset.to_bytes(width, 'big') + index.to_bytes(2, 'big'))
+            elif offset:
+                entries.append(b"\x01" + offset.to_bytes(width, 'big') + b"\x00\x00")
+            else:
+                entries.append(b"\x00" + bytes(width + 2))  # свободный номер
+        data = self._compress(b"".join(entries))
+        
+        self._write(b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 %d 2] /Filter /FlateDecode /Length %d %s>>\n"
+                    b"stream\n" % (xref_number, len(self._offsets) + 1, width, len(data), trailer)
+                    + data + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % xref_position)
+
+
+class StreamingPDFWriter(PDFObjectWriter):
+    """Минимальный потоковый писатель PDF для быстрого табличного backend-а
+    
+    Каждая страница записывается в файл сразу после отрисовки, в памяти
+    остаются только смещения объектов и номера страниц (массивы целых чисел).
+    TTF шрифт встраивается как CIDFontType2 с кодировкой Identity-H, поэтому
+    кириллица отображается без подмножеств по 256 символов; в файл попадают
+    только использованные глифы (подмножество через fontTools). Без TTF
+    используется встроенный Helvetica (WinAnsi).
+    """
+    
+    # Номера объектов, которые пишутся в конце файла
+    CATALOG_OBJECT = 1
+    PAGES_OBJECT = 2
+    FONT_OBJECT = 3
+    
+    def __init__(self, file, page_size: Tuple[float, float], font_name: str):
+        super().__init__(file, object_count=3)
+        self.page_size = page_size
+        self.font_name = font_name
+        self._font = FontRegistry.get_font(font_name) if REPORTLAB_AVAILABLE else None
+        self._pages = array('I')
+        # Кэш кодирования символов в идентификаторы глифов и использованные глифы
+        self._glyph_hex: Dict[str, str] = {}
+        self._used_glyphs: Dict[int, str] = {}
+        # Размер встроенного шрифта: полного файла и записанного подмножества
+        self.font_bytes: Tuple[int, int] = (0, 0)
+    
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+    
+    def encode_text(self, text: str) -> bytes:
+        """Кодирует строку в операнд оператора Tj"""
+        if self._font is None:
+            data = text.encode('cp1252', 'replace')
+            return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+        
+        glyph_hex = self._glyph_hex
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                data = list(reader)
-                if not data:
-                    return [], []
-                return data[0], data[1:]  # заголовки, данные
-        except Exception as e:
-            raise Exception(f"Ошибка чтения CSV файла: {e}")
+            return b"<" + "".join(map(glyph_hex.__getitem__, text)).encode('ascii') + b">"
+        except KeyError:
+            pass
+        
+        parts = []
+        for char in text:
+            code = glyph_hex.get(char)
+            if code is None:
+                glyph = self._font.face.charToGlyph.get(ord(char), 0)
+                if glyph:
+                    self._used_glyphs.setdefault(glyph, char)
+                code = glyph_hex[char] = "%04X" % glyph
+            parts.append(code)
+        return b"<" + "".join(parts).encode('ascii') + b">"
+    
+    def add_page(self, content: bytes):
+        """Записывает страницу с готовым потоком операторов"""
+        content_number = self.allocate()
+        self.write_stream(content_number, content)
+        page_number = self.allocate()
+        width, height = self.page_size
+        self.write_compressed(page_number, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (self.PAGES_OBJECT, width, height, self.FONT_OBJECT, content_number)))
+        self._pages.append(page_number)
     
     @staticmethod
-    def read_json(file_path: str) -> Tuple[List[str], List[List[str]]]:
-        """Читает JSON файл"""
+    def _subset_font(font_data: bytes, glyphs: List[int]) -> bytes:
+        """Оставляет в TTF только указанные глифы, сохраняя их номера (Identity-H ссылается на них)
+        
+        Без fontTools возвращает шрифт целиком.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                
-            if isinstance(data, list) and data:
-                # Если это список словарей
-                if isinstance(data[0], dict):
-                    columns = list(data[0].keys())
-                    rows = [[str(row.get(col, '')) for col in columns] for row in data]
-                    return columns, rows
-                else:
-                    # Если это список списков
-                    return [f"Колонка_{i+1}" for i in range(len(data[0]))], data
-            elif isinstance(data, dict):
-                # Если это словарь
-                columns = list(data.keys())
-                rows = [[str(data[col])] for col in columns]
-                return columns, rows
-            else:
-                raise Exception("Неподдерживаемый формат JSON")
-        except Exception as e:
-            raise Exception(f"Ошибка чтения JSON файла: {e}")
+            from fontTools import subset
+            from fontTools.ttLib import TTFont as FontToolsFont
+        except ImportError:
+            return font_data
+        
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.hinting = False
+        options.layout_features = []
+        font = FontToolsFont(io.BytesIO(font_data))
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=[0] + glyphs)
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        font.save(buffer)
+        return buffer.getvalue()
+    
+    def _write_font(self):
+        """Записывает объекты шрифта: используются только глифы, встреченные в тексте"""
+        if self._font is None:
+            self.write_compressed(self.FONT_OBJECT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                                                    b"/Encoding /WinAnsiEncoding >>")
+            return
+        
+        face = self._font.face
+        glyphs = sorted(self._used_glyphs)
+        
+        with open(face.filename, 'rb') as font_file:
+            full_data = font_file.read()
+        font_data = self._subset_font(full_data, glyphs)
+        self.font_bytes = (len(full_data), len(font_data))
+        base_font = bytes(face.name)
+        if font_data is not full_data:
+            # Имя подмножества по спецификации PDF: шесть заглавных букв и '+'
+            digest = hashlib.md5(repr(glyphs).encode('ascii')).digest()
+            base_font = bytes(65 + value % 26 for value in digest[:6]) + b"+" + base_font
+        font_file_number = self.allocate()
+        self.write_stream(font_file_number, font_data, b"/Length1 %d " % len(font_data))
+        
+        descriptor_number = self.allocate()
+        self.write_compressed(descriptor_number, (
+            b"<< /Type /FontDescriptor /FontName /%s /Flags %d /FontBBox [%s] /ItalicAngle %s "
+            b"/Ascent %d /Descent %d /CapHeight %d /StemV %d /FontFile2 %d 0 R >>"
+            % (base_font, face.flags, " ".join("%d" % value for value in face.bbox).encode('ascii'),
+               str(face.italicAngle).encode('ascii'), face.ascent, face.descent, face.capHeight,
+               face.stemV, font_file_number)))
+        
+        widths = b" ".join(b"%d [%d]" % (glyph, round(face.charWidths.get(ord(self._used_glyphs[glyph]),
+                                                                            face.defaultWidth)))
+                           for glyph in glyphs)
+        cid_font_number = self.allocate()
+        self.write_compressed(cid_font_number, (
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor %d 0 R /DW %d /W [%s] /CIDToGIDMap /Identity >>"
+            % (base_font, descriptor_number, round(face.defaultWidth), widths)))
+        
+        # ToUnicode нужен для копирования и поиска текста в PDF
+        mappings = [b"<%04X> <%s>" % (glyph, self._used_glyphs[glyph].encode('utf-16-be').hex().upper().encode('ascii'))
+                    for glyph in glyphs]
+        blocks = b"".join(b"%d beginbfchar\n%s\nendbfchar\n" % (len(mappings[i:i + 100]),
+                                                                  b"\n".join(mappings[i:i + 100]))
+                          for i in range(0, len(mappings), 100))
+        to_unicode_number = self.allocate()
+        self.write_stream(to_unicode_number, (
+            b"/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            b"/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+            b"1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+            + blocks +
+            b"endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend"))
+        
+        self.write_compressed(self.FONT_OBJECT, (
+            b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H "
+            b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>"
+            % (base_font, cid_font_number, to_unicode_number)))
+    
+    def close(self):
+        """Дописывает шрифт, дерево страниц, каталог и таблицу перекрестных ссылок"""
+        self._write_font()
+        
+        kids = b" ".join(b"%d 0 R" % number for number in self._pages)
+        self.write_compressed(self.PAGES_OBJECT, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                              % (kids, len(self._pages)))
+        self.write_compressed(self.CATALOG_OBJECT, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES_OBJECT)
+        self.finish(b"/Root %d 0 R " % self.CATALOG_OBJECT)
+
+
+class PDFOptimizer:
+    """Стадия оптимизации размера готового PDF
+    
+    Одинаковые объекты (ресурсы и шрифты фрагментов, склеенных из нескольких
+    PDF) остаются в одном экземпляре, неиспользуемые удаляются, несжатые
+    потоки сжимаются FlateDecode, а документ переписывается в PDF 1.5 с
+    потоками объектов и xref-потоком (PDFObjectWriter). Шрифты ReportLab и
+    WeasyPrint встраиваются подмножествами глифов, быстрый backend пишет
+    подмножество и потоки объектов сам, поэтому через эту стадию не проходит.
+    
+    Стадия выключена по умолчанию: она уменьшает PDF примерно на 10%, но
+    добавляет к рендерингу ReportLab около четверти времени, а модель выбора
+    backend-а его не учитывает. Включается флагом --optimize для архивных
+    выгрузок (переменная окружения наследуется воркерами).
+    """
+    
+    ENV_ENABLE = 'DATAFORGEPDF_OPTIMIZE'
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        """Оптимизация включена и pypdf установлен"""
+        return PYPDF_AVAILABLE and bool(os.environ.get(cls.ENV_ENABLE))
+    
+    @classmethod
+    def configure(cls, enabled: bool):
+        """Включает или отключает оптимизацию для процесса и его воркеров"""
+        if enabled:
+            os.environ[cls.ENV_ENABLE] = '1'
+        else:
+            os.environ.pop(cls.ENV_ENABLE, None)
     
     @staticmethod
-    def read_excel(file_path: str) -> Tuple[List[str], List[List[str]]]:
-        """Читает Excel файл"""
-        try:
-            workbook = openpyxl.load_workbook(file_path, data_only=True)
-            sheet = workbook.active
-            
-            data = []
-            for row in sheet.iter_rows(values_only=True):
-                if any(cell is not None for cell in row):
-                    data.append([str(cell) if cell is not None else '' for cell in row])
-            
-            if not data:
-                return [], []
-            
-            return data[0], data[1:]  # заголовки, данные
-        except Exception as e:
-            raise Exception(f"Ошибка чтения Excel файла: {e}")
+    def _serialize(obj: Any) -> bytes:
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer)
+        return buffer.getvalue()
     
     @staticmethod
-    def read_word(file_path: str) -> Tuple[List[str], List[List[str]]]:
-        """Читает Word файл"""
-        try:
-            doc = Document(file_path)
-            data = []
-            
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    # Разделяем текст по табуляции или другим разделителям
-                    row = [cell.strip() for cell in paragraph.text.split('\t')]
-                    if len(row) == 1:
-                        row = [paragraph.text.strip()]
-                    data.append(row)
-            
-            if not data:
-                return [], []
-            
-            # Определяем максимальное количество колонок
-            max_cols = max(len(row) for row in data)
+    def _rewrite(reader: "PdfReader", temp_path: str):
+        """Переписывает документ в PDF 1.5 с потоками объектов и xref-потоком"""
+        from pypdf.generic import StreamObject
+        
+        numbers = sorted(reader.xref.get(0, {}))
+        with open(temp_path, 'wb') as file:
+            output = PDFObjectWriter(file, object_count=max(numbers, default=0))
+            for number in numbers:
+                obj = reader.get_object(number)
+                if isinstance(obj, StreamObject):
+                    if '/Filter' not in obj:
+                        obj = obj.flate_encode()
+                    output.write_object(number, PDFOptimizer._serialize(obj))
+                elif obj is not None:
+                    output.write_compressed(number, PDFOptimizer._serialize(obj))
             
-            # Нормализуем данные
-            normalized_data = []
-            for row in data:
-                normalized_row = row + [''] * (max_cols - len(row))
-                normalized_data.append(normalized_row)
+            trailer = b"/Root " + PDFOptimizer._serialize(reader.trailer.raw_get('/Root')) + b" "
+            for key in ('/Info', '/ID'):
+                if key in reader.trailer:
+                    trailer += key.encode('ascii') + b" " + \
+                        PDFOptimizer._serialize(reader.trailer.raw_get(key)) + b" "
+            output.finish(trailer)
+    
+    @staticmethod
+    def optimize(pdf_path: str) -> Tuple[int, int]:
+        """Оптимизирует PDF на месте и возвращает размер до и после в байтах"""
+        from pypdf import PdfReader, PdfWriter
+        
+        before = os.path.getsize(pdf_path)
+        with Instrumentation.phase('optimize', before_bytes=before) as metrics:
+            writer = PdfWriter(clone_from=pdf_path)
+            writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+            buffer = io.BytesIO()
+            writer.write(buffer)
             
-            # Создаем заголовки
-            columns = [f"Колонка_{i+1}" for i in range(max_cols)]
+            reader = PdfReader(buffer)
+            temp_path = f"{pdf_path}.{os.getpid()}.tmp"
+            try:
+                PDFOptimizer._rewrite(reader, temp_path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
             
-            return columns, normalized_data
-        except Exception as e:
-            raise Exception(f"Ошибка чтения Word файла: {e}")
+            after = os.path.getsize(temp_path)
+            if after < before:
+                os.replace(temp_path, pdf_path)
+            else:
+                os.remove(temp_path)
+                after = before
+            metrics['after_bytes'] = after
+        
+        print(f"🗜️  Оптимизация PDF: {before / 1024:.1f} КБ -> {after / 1024:.1f} КБ "
+              f"({(after - before) / before * 100:+.1f}%)")
+        return before, after
+
+
+class BackendSelector:
+    """Выбор backend-а по оценке времени рендеринга и памяти
+    
+    Время оценивается линейной моделью: накладные расходы + число ячеек *
+    (стоимость ячейки + средняя длина ячейки * стоимость символа), память -
+    базовый объем + объем на ячейку. Небольшие отчеты уходят в WeasyPrint
+    (полное оформление шаблона), крупнее - в ReportLab, самые большие - в
+    быстрый табличный backend. Коэффициенты по умолчанию получены прогоном
+    scripts/benchmark.py и уточняются по его результатам (calibrate),
+    пороги переопределяются из командной строки. Настройки передаются
+    процессам-воркерам через переменную окружения DATAFORGEPDF_BACKEND_MODEL.
+    """
+    
+    ENV_MODEL = 'DATAFORGEPDF_BACKEND_MODEL'
+    
+    # overhead_s - постоянные расходы, cell_s - на ячейку, char_s - на символ ячейки,
+    # base_mb - память процесса без данных, cell_kb - память на ячейку таблицы
+    DEFAULT_COSTS = {
+        'weasyprint': {'overhead_s': 1.0, 'cell_s': 500e-6, 'char_s': 5e-6, 'base_mb': 80, 'cell_kb': 4.0},
+        'reportlab': {'overhead_s': 0.15, 'cell_s': 55e-6, 'char_s': 0.5e-6, 'base_mb': 40, 'cell_kb': 0.3},
+        'fast': {'overhead_s': 0.08, 'cell_s': 18e-6, 'char_s': 0.3e-6, 'base_mb': 35, 'cell_kb': 0.0},
+    }
+    
+    # Предельное оценочное время для WeasyPrint и ReportLab и бюджет памяти
+    DEFAULT_THRESHOLDS = {
+        'weasyprint_max_seconds': 15.0,
+        'reportlab_max_seconds': 60.0,
+        'memory_budget_mb': 2048.0,
+    }
+    
+    _model: Optional[Dict[str, Any]] = None
+    
+    @classmethod
+    def model(cls) -> Dict[str, Any]:
+        """Возвращает текущие коэффициенты и пороги (с учетом настроек из окружения)"""
+        if cls._model is None:
+            model = {
+                'costs': {backend: dict(costs) for backend, costs in cls.DEFAULT_COSTS.items()},
+                'thresholds': dict(cls.DEFAULT_THRESHOLDS),
+            }
+            overrides = os.environ.get(cls.ENV_MODEL)
+            if overrides:
+                try:
+                    overrides = json.loads(overrides)
+                    for backend, costs in overrides.get('costs', {}).items():
+                        model['costs'].setdefault(backend, {}).update(costs)
+                    model['thresholds'].update(overrides.get('thresholds', {}))
+                except Exception as e:
+                    print(f"⚠️  Некорректные настройки выбора backend-а ({cls.ENV_MODEL}): {e}")
+            cls._model = model
+        return cls._model
+    
+    @classmethod
+    def configure(cls, calibration_path: Optional[str] = None, **thresholds: Optional[float]):
+        """Уточняет коэффициенты по результатам бенчмарка и задает пороги для процесса и воркеров"""
+        model = cls.model()
+        if calibration_path:
+            model['costs'].update(cls.calibrate(calibration_path, model['costs']))
+        for name, value in thresholds.items():
+            if value is not None:
+                model['thresholds'][name] = float(value)
+        os.environ[cls.ENV_MODEL] = json.dumps(model)
     
     @staticmethod
-    def read_txt(file_path: str, separator: str = '\t') -> Tuple[List[str], List[List[str]]]:
-        """Читает TXT файл"""
+    def calibrate(results_path: str, costs: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        """Масштабирует коэффициенты по замерам рендеринга из JSON scripts/benchmark.py
+        
+        Для каждого backend-а время модели умножается на медиану отношения
+        замеренного времени к оценке, память на ячейку - медиана по замерам.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-            
-            data = []
-            for line in lines:
-                line = line.strip()
-                if line:
-                    row = [cell.strip() for cell in line.split(separator)]
-                    data.append(row)
-            
-            if not data:
-                return [], []
+            with open(results_path, 'r', encoding='utf-8') as file:
+                results = json.load(file)['results']
+        except Exception as e:
+            raise Exception(f"Ошибка чтения результатов бенчмарка: {e}")
+        
+        def median(values: List[float]) -> float:
+            values = sorted(values)
+            middle = len(values) // 2
+            return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+        
+        calibrated = {}
+        for backend, base in costs.items():
+            cases = [case for case in results
+                     if case.get('phase') == 'render' and case.get('target') == backend and 'error' not in case]
+            if not cases:
+                continue
             
-            # Определяем максимальное количество колонок
-            max_cols = max(len(row) for row in data)
+            ratios = []
+            memory = []
+            for case in cases:
+                cells = case['rows'] * case['cols']
+                estimate = base['overhead_s'] + cells * (base['cell_s'] + case['cell_len'] * base['char_s'])
+                ratios.append(case['seconds'] / estimate)
+                if case.get('peak_rss_mb') is not None and cells:
+                    memory.append(max(case['peak_rss_mb'] - base['base_mb'], 0) * 1024 / cells)
             
-            # Нормализуем данные
-            normalized_data = []
-            for row in data:
-                normalized_row = row + [''] * (max_cols - len(row))
-                normalized_data.append(normalized_row)
+            scale = median(ratios)
+            costs_for_backend = dict(base)
+            for key in ('overhead_s', 'cell_s', 'char_s'):
+                costs_for_backend[key] = base[key] * scale
+            if memory and base['cell_kb']:
+                costs_for_backend['cell_kb'] = median(memory)
+            calibrated[backend] = costs_for_backend
+            print(f"🧮 Калибровка {backend}: {len(cases)} замеров, коэффициент времени {scale:.2f}")
+        return calibrated
+    
+    @classmethod
+    def estimate(cls, backend: str, row_count: int, column_count: int,
+                 avg_cell_len: float) -> Tuple[float, float]:
+        """Оценивает время (с) и память (МБ) рендеринга таблицы backend-ом"""
+        costs = cls.model()['costs'][backend]
+        cells = row_count * column_count
+        seconds = costs['overhead_s'] + cells * (costs['cell_s'] + avg_cell_len * costs['char_s'])
+        memory_mb = costs['base_mb'] + cells * costs['cell_kb'] / 1024
+        return seconds, memory_mb
+    
+    @classmethod
+    def choose(cls, columns: List[str], rows: Iterable[List[str]]) -> str:
+        """Выбирает backend для таблицы по оценке стоимости рендеринга
+        
+        Для RowSource количество строк оценивается по размеру файла и выборке
+        (RowSource.estimate_len), поэтому выбор не требует полного прохода.
+        """
+        sample = ColumnWidthPlanner.sample_rows(rows)
+        row_count = (rows.estimate_len(sample, ColumnWidthPlanner.SAMPLE_ROWS)
+                     if isinstance(rows, RowSource) else len(rows))
+        lengths = [len(value) if isinstance(value, str) else len(format_cell(value))
+                   for row in sample for value in row]
+        avg_cell_len = sum(lengths) / len(lengths) if lengths else 0.0
+        thresholds = cls.model()['thresholds']
+        
+        with Instrumentation.phase('select', rows=row_count, columns=len(columns),
+                                   avg_cell_len=round(avg_cell_len, 1)) as metrics:
+            candidates = []
+            if USE_WEASYPRINT:
+                candidates.append(('weasyprint', thresholds['weasyprint_max_seconds']))
+            if REPORTLAB_AVAILABLE:
+                candidates.append(('reportlab', thresholds['reportlab_max_seconds']))
             
-            # Создаем заголовки
-            columns = [f"Колонка_{i+1}" for i in range(max_cols)]
+            backend = 'fast'
+            for name, max_seconds in candidates:
+                seconds, memory_mb = cls.estimate(name, row_count, len(columns), avg_cell_len)
+                metrics[f'{name}_estimate_s'] = round(seconds, 3)
+                if seconds <= max_seconds and memory_mb <= thresholds['memory_budget_mb']:
+                    backend = name
+                    break
             
-            return columns, normalized_data
-        except Exception as e:
-            raise Exception(f"Ошибка чтения TXT файла: {e}")
+            seconds, memory_mb = cls.estimate(backend, row_count, len(columns), avg_cell_len)
+            metrics['backend'] = backend
+            metrics['estimate_s'] = round(seconds, 3)
+            metrics['estimate_mb'] = round(memory_mb, 1)
+        
+        print(f"🧮 Выбран backend {backend}: {row_count} строк x {len(columns)} колонок, "
+              f"оценка {seconds:.1f} с, {memory_mb:.0f} МБ")
+        return backend
 
 
 class PDFGenerator:
     """Класс для генерации PDF файлов"""
     
-    def __init__(self, template_path: str):
+    # Размер фрагмента по умолчанию для параллельного рендеринга WeasyPrint
+    DEFAULT_CHUNK_ROWS = 500
+    
+    # Backend-ы, которые можно выбрать явно
+    BACKENDS = ('weasyprint', 'reportlab', 'fast')
+    
+    # Ширина области содержимого страницы A4 в шаблоне WeasyPrint (px) и
+    # горизонтальные отступы ячейки (padding 12px слева и справа)
+    WEASYPRINT_CONTENT_WIDTH = 600
+    WEASYPRINT_CELL_PADDING = 24
+    
+    # Параметры быстрого табличного backend-а (в пунктах): поля страницы, шрифт,
+    # высота строки текста, отступ текста в ячейке и максимум строк текста в ячейке
+    FAST_MARGIN = 36
+    FAST_FONT_SIZE = 8
+    FAST_HEADER_FONT_SIZE = 9
+    FAST_LINE_HEIGHT = 10
+    FAST_CELL_PADDING = 3
+    FAST_MAX_LINES = 2
+    
+    # Сколько подготовленных ячеек держать в кэше быстрого backend-а
+    FAST_CELL_CACHE = 65536
+    
+    # Числа (в том числе с разделителями разрядов, экспонентой и процентом) не
+    # обрезаются: если число не помещается в колонку, уменьшается шрифт ячейки
+    FAST_NUMBER = re.compile(r'[-+]?[\d\s.,]*\d[\d\s.,]*(?:[eE][-+]?\d+)?%?')
+    
+    def __init__(self, template_path: str, chunk_rows: int = 0, workers: Optional[int] = None):
+        """chunk_rows > 0 включает параллельный рендеринг фрагментами по chunk_rows строк"""
         self.template_path = template_path
         self.template = self._load_template()
+        self.chunk_rows = chunk_rows
+        self.workers = workers
+        # Количество строк и колонок, отрисованных последним вызовом generate_pdf
+        self.rendered_rows: Optional[int] = None
+        self.rendered_columns: Optional[int] = None
     
-    def _load_template(self) -> Template:
-        """Загружает HTML шаблон"""
+    def _load_template(self) -> "Template":
+        """Загружает HTML шаблон из общего кэша скомпилированных шаблонов"""
         try:
-            with open(self.template_path, 'r', encoding='utf-8') as file:
-                return Template(file.read())
+            return get_template(self.template_path)
         except Exception as e:
             raise Exception(f"Ошибка загрузки шаблона: {e}")
     
-    def generate_pdf(self, columns: List[str], rows: List[List[str]], 
-                     output_path: str, filename: str) -> str:
-        """Генерирует PDF файл"""
+    def generate_pdf(self, columns: List[str], rows: Iterable[List[str]], 
+                     output_path: str, filename: str, backend: Optional[str] = None,
+                     fallback: Optional[bool] = None) -> str:
+        """Генерирует PDF файл
+        
+        rows может быть ColumnarTable, списком, RowSource или любым итерируемым
+        объектом; для WeasyPrint и ReportLab все, кроме ColumnarTable, один раз
+        переводится в колоночную таблицу, быстрый backend читает строки потоком.
+        backend задает генератор явно (без fallback), None - выбор по оценке
+        стоимости (BackendSelector) с fallback с WeasyPrint на ReportLab.
+        fallback переопределяет это, если backend уже выбран по оценке вызывающим.
+        """
         try:
             pdf_path = os.path.join(output_path, f"{filename}.pdf")
             
-            if USE_WEASYPRINT:
-                # Используем WeasyPrint
-                return self._generate_weasyprint_pdf(columns, rows, pdf_path, filename)
-            elif REPORTLAB_AVAILABLE:
-                # Используем ReportLab
-                return self._generate_reportlab_pdf(columns, rows, pdf_path, filename)
+            if fallback is None:
+                fallback = backend is None
+            if backend is None:
+                if not hasattr(rows, '__len__'):
+                    rows = ColumnarTable.from_rows(columns, rows)
+                backend = BackendSelector.choose(columns, rows)
+            
+            if backend == 'fast':
+                # Быстрый backend читает строки потоком и не строит таблицу в памяти,
+                # поэтому ширину ragged-источника узнает отдельным проходом
+                if isinstance(rows, RowSource):
+                    columns, rows = rows.padded(columns)
+                self.rendered_columns = len(columns)
+                return self._generate_fast_pdf(columns, rows, pdf_path, filename)
+            
+            # Ширина ragged-источника определяется при построении таблицы
+            rows = ColumnarTable.from_rows(columns, rows)
+            columns = rows.columns
+            self.rendered_rows = len(rows)
+            self.rendered_columns = len(columns)
+            
+            if backend == 'weasyprint':
+                pdf_path = self._generate_weasyprint_pdf(columns, rows, pdf_path, filename, fallback=fallback)
+            elif backend == 'reportlab':
+                pdf_path = self._generate_reportlab_pdf(columns, rows, pdf_path, filename)
             else:
-                raise Exception("Не удалось импортировать ни WeasyPrint, ни ReportLab")
+                raise Exception(f"Неизвестный backend: {backend}")
+            
+            if PDFOptimizer.enabled():
+                try:
+                    PDFOptimizer.optimize(pdf_path)
+                except Exception as e:
+                    # Оптимизация необязательна: оставляем PDF как есть
+                    print(f"⚠️  Оптимизация PDF не выполнена: {e}")
+            return pdf_path
         except Exception as e:
             raise Exception(f"Ошибка генерации PDF: {e}")
     
-    def _generate_weasyprint_pdf(self, columns: List[str], rows: List[List[str]], 
-                                 pdf_path: str, filename: str) -> str:
+    def _plan_weasyprint_columns(self, columns: List[str], rows: Iterable[List[str]]) -> List[float]:
+        """Рассчитывает ширины колонок для шаблона в процентах (table-layout: fixed)
+        
+        Нужны только пропорции, поэтому измерение идет встроенным шрифтом
+        Helvetica без загрузки TTF.
+        """
+        with Instrumentation.phase('columns', backend='weasyprint') as metrics:
+            widths = ColumnWidthPlanner.plan(columns, rows, self.WEASYPRINT_CONTENT_WIDTH, 'Helvetica',
+                                             font_size=10, header_font_size=11,
+                                             padding=self.WEASYPRINT_CELL_PADDING)
+            metrics['columns'] = len(widths)
+        
+        total = sum(widths)
+        return [round(width * 100 / total, 2) for width in widths] if total else []
+    
+    def _generate_weasyprint_pdf(self, columns: List[str], rows: Iterable[List[str]], 
+                                 pdf_path: str, filename: str, fallback: bool = True) -> str:
         """Генерирует PDF с помощью WeasyPrint с поддержкой кириллицы"""
         try:
             # Подготавливаем данные для шаблона
             timestamp = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+            row_count = len(rows)
+            
+            # Фиксированные ширины колонок избавляют верстку от измерения всех ячеек
+            column_widths = self._plan_weasyprint_columns(columns, rows)
+            
+            if self.chunk_rows and row_count > self.chunk_rows:
+                if PYPDF_AVAILABLE:
+                    return self._generate_weasyprint_chunked(columns, rows, row_count, pdf_path,
+                                                             filename, timestamp, column_widths)
+                print("⚠️  pypdf недоступен, фрагменты не могут быть объединены - рендерим целиком")
             
             # Рендерим HTML
-            html_content = self.template.render(
-                columns=columns,
-                rows=rows,
-                timestamp=timestamp,
-                filename=filename
-            )
+            with Instrumentation.phase('template', backend='weasyprint', rows=row_count) as metrics:
+                html_content = self.template.render(
+                    columns=columns,
+                    column_widths=column_widths,
+                    rows=rows,
+                    row_count=row_count,
+                    timestamp=timestamp,
+                    filename=filename,
+                    show_footer=True,
+                    page_numbers=True
+                )
+                metrics['html_chars'] = len(html_content)
             
-            # Создаем PDF с поддержкой кириллицы (шрифты уже в HTML шаблоне)
-            html = HTML(string=html_content)
+            # Верстка и запись разделены, чтобы замерять их отдельно; стили шаблона
+            # и шрифты с поддержкой кириллицы разобраны заранее (WeasyPrintStyles)
+            with Instrumentation.phase('layout', backend='weasyprint', rows=row_count) as metrics:
+                document = WeasyPrintStyles.render(self.template_path, html_content)
+                metrics['pages'] = len(document.pages)
             
             # Генерируем PDF без дополнительного CSS
-            html.write_pdf(pdf_path)
+            with Instrumentation.phase('write', backend='weasyprint') as metrics:
+                document.write_pdf(pdf_path)
+                metrics['pages'] = len(document.pages)
+                metrics['output_bytes'] = os.path.getsize(pdf_path)
             
             print("✅ PDF создан с помощью WeasyPrint с поддержкой кириллицы")
             return pdf_path
         except Exception as e:
+            if not fallback:
+                raise
+            
             # Если WeasyPrint не работает, используем ReportLab
             print(f"⚠️  WeasyPrint не работает: {e}")
             print("🔄 Используем ReportLab как fallback...")
             return self._generate_reportlab_pdf(columns, rows, pdf_path, filename)
     
-    def _generate_reportlab_pdf(self, columns: List[str], rows: List[List[str]], 
+    def _generate_weasyprint_chunked(self, columns: List[str], rows: Iterable[List[str]], row_count: int,
+                                     pdf_path: str, filename: str, timestamp: str,
+                                     column_widths: List[float]) -> str:
+        """Рендерит таблицу фрагментами в пуле процессов и склеивает их в один PDF"""
+        from concurrent.futures import ProcessPoolExecutor
+        
+        chunk_count = (row_count + self.chunk_rows - 1) // self.chunk_rows
+        workers = self.workers or os.cpu_count() or 1
+        print(f"🔄 Параллельный рендеринг: {chunk_count} фрагментов по {self.chunk_rows} строк, "
+              f"процессов: {workers}")
+        
+        with tempfile.TemporaryDirectory(prefix='dataforgepdf-') as temp_dir:
+            chunk_paths = []
+            with Instrumentation.phase('layout', backend='weasyprint', rows=row_count,
+                                       chunks=chunk_count, workers=workers), \
+                    ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = []
+                row_iter = iter(rows)
+                for index in range(chunk_count):
+                    chunk = list(islice(row_iter, self.chunk_rows))
+                    if not chunk:
+                        break
+                    context = {
+                        'columns': columns,
+                        # Общие ширины колонок выравнивают таблицы всех фрагментов
+                        'column_widths': column_widths,
+                        'rows': chunk,
+                        'row_count': row_count,
+                        'timestamp': timestamp,
+                        'filename': filename,
+                        'show_footer': index == chunk_count - 1,
+                        # Сквозная нумерация проставляется после склейки
+                        'page_numbers': False,
+                    }
+                    chunk_path = os.path.join(temp_dir, f"chunk_{index:06d}.pdf")
+                    pending.append(executor.submit(_render_weasyprint_chunk, self.template_path,
+                                                   context, chunk_path))
+                    
+                    # Ограничиваем число фрагментов в очереди, чтобы не держать все строки в памяти
+                    if len(pending) >= workers * 2:
+                        chunk_paths.append(pending.pop(0).result())
+                
+                chunk_paths.extend(future.result() for future in pending)
+            
+            # Склеиваем фрагменты в исходном порядке
+            from pypdf import PdfReader, PdfWriter
+            
+            with Instrumentation.phase('write', backend='weasyprint', chunks=len(chunk_paths)) as metrics:
+                writer = PdfWriter()
+                for chunk_path in chunk_paths:
+                    writer.append(PdfReader(chunk_path))
+                
+                self._stamp_page_numbers(writer)
+                
+                with open(pdf_path, 'wb') as file:
+                    writer.write(file)
+                metrics['pages'] = len(writer.pages)
+                metrics['output_bytes'] = os.path.getsize(pdf_path)
+        
+        print(f"✅ PDF собран из {len(chunk_paths)} фрагментов WeasyPrint")
+        return pdf_path
+    
+    @staticmethod
+    def _stamp_page_numbers(writer: "PdfWriter"):
+        """Проставляет сквозную нумерацию страниц 'N / M' после склейки фрагментов"""
+        from pypdf import PdfReader
+        from reportlab.pdfgen import canvas as pdf_canvas
+        
+        total = len(writer.pages)
+        buffer = io.BytesIO()
+        overlay = pdf_canvas.Canvas(buffer)
+        for number, page in enumerate(writer.pages, 1):
+            width = float(page.mediabox.width)
+            overlay.setPageSize((width, float(page.mediabox.height)))
+            overlay.setFont('Helvetica', 8)
+            overlay.drawCentredString(width / 2, 12, f"{number} / {total}")
+            overlay.showPage()
+        overlay.save()
+        
+        stamps = PdfReader(buffer)
+        for page, stamp in zip(writer.pages, stamps.pages):
+            page.merge_page(stamp)
+    
+    def _generate_reportlab_pdf(self, columns: List[str], rows: Iterable[List[str]], 
                                 pdf_path: str, filename: str) -> str:
         """Генерирует PDF с помощью ReportLab с полной поддержкой кириллицы"""
+        from reportlab import rl_config
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+        
         # Создаем документ
         doc = SimpleDocTemplate(pdf_path, pagesize=A4)
         story = []
@@ -258,38 +2417,8 @@ class PDFGenerator:
         # Стили
         styles = getSampleStyleSheet()
         
-        # Регистрируем шрифты с поддержкой кириллицы
-        try:
-            from reportlab.pdfbase.ttfonts import TTFont
-            from reportlab.pdfbase import pdfmetrics
-            
-            # Пытаемся загрузить шрифт DejaVu Sans (отличная поддержка кириллицы)
-            try:
-                pdfmetrics.registerFont(TTFont('DejaVuSans', 'fonts/DejaVuSans.ttf'))
-                font_name = 'DejaVuSans'
-                print("✅ Используем шрифт DejaVu Sans с полной поддержкой кириллицы")
-            except Exception as e:
-                try:
-                    # Fallback на системный шрифт Arial Unicode MS
-                    pdfmetrics.registerFont(TTFont('ArialUnicode', 'fonts/Arial Unicode.ttf'))
-                    font_name = 'ArialUnicode'
-                    print("✅ Используем системный шрифт Arial Unicode MS с полной поддержкой кириллицы")
-                except Exception as e2:
-                    try:
-                        # Fallback на Roboto Bold
-                        pdfmetrics.registerFont(TTFont('RobotoBold', 'fonts/Roboto-Bold.ttf'))
-                        font_name = 'RobotoBold'
-                        print("✅ Используем шрифт Roboto Bold с поддержкой кириллицы")
-                    except Exception as e3:
-                        # Последний fallback на встроенные шрифты
-                        font_name = 'Helvetica'
-                        print(f"⚠️  Используем встроенный шрифт Helvetica (кириллица может не отображаться)")
-                        print(f"   Ошибка DejaVu Sans: {e}")
-                        print(f"   Ошибка Arial Unicode: {e2}")
-                        print(f"   Ошибка Roboto Bold: {e3}")
-        except Exception as e:
-            font_name = 'Helvetica'
-            print(f"⚠️  Ошибка импорта шрифтов: {e}")
+        # Шрифт с поддержкой кириллицы загружается один раз на процесс
+        font_name = FontRegistry.get_font_name()
         
         # Функция для безопасного текста (БЕЗ транслитерации)
         def safe_text(text):
@@ -342,13 +2471,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # Создаем таблицу с поддержкой кириллицы (БЕЗ транслитерации)
-        safe_columns = [safe_text(col) for col in columns]
-        safe_rows = [[safe_text(cell) for cell in row] for row in rows]
-        table_data = [safe_columns] + safe_rows
-        
-        # Настройки таблицы
-        table = Table(table_data)
-        table.setStyle(TableStyle([
+        table_style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -362,32 +2485,382 @@ class PDFGenerator:
             ('FONTSIZE', (0, 1), (-1, -1), 8),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        ])
+        safe_columns = [safe_text(col) for col in columns]
+        
+        # safe_text применяется один раз к каждому различному значению колонки
+        safe_rows = ColumnarTable.from_rows(columns, rows).map_values(safe_text)
+        
+        # Таблица строится фрагментами по одной странице: одна гигантская
+        # таблица измеряется и делится целиком, что нелинейно по времени и памяти
+        frame_height = doc.height - 12  # Frame по умолчанию имеет отступы 6pt сверху и снизу
+        
+        # Ширины колонок по выборке строк: общие для всех фрагментов,
+        # поэтому колонки совпадают на всех страницах
+        with Instrumentation.phase('columns', backend='reportlab') as metrics:
+            col_widths = ColumnWidthPlanner.plan(safe_columns, safe_rows, doc.width, font_name,
+                                                 font_size=8, header_font_size=10, padding=12)
+            metrics['columns'] = len(col_widths)
+        
+        # Высоты строк берутся из самого стиля таблицы: заголовок, однострочная
+        # строка данных и прибавка за каждую следующую строку текста в ячейке
+        def table_height(table_rows: List[List[str]]) -> float:
+            table = LongTable(table_rows, colWidths=col_widths)
+            table.setStyle(table_style)
+            return table.wrap(doc.width, frame_height)[1]
+        
+        header_height = table_height([safe_columns])
+        blank_row = [''] * len(safe_columns)
+        row_height = table_height([safe_columns, blank_row]) - header_height
+        line_height = table_height([safe_columns, ['\n'] + blank_row[1:]]) - header_height - row_height
+        
+        # Место под таблицу на первой странице: за вычетом заголовка, сведений о
+        # файле и отступов так же, как их размещает Frame
+        first_page_height = frame_height
+        previous_space = 0
+        for index, flowable in enumerate(story):
+            space_before = flowable.getSpaceBefore() if index else 0
+            if index and rl_config.overlapAttachedSpace:
+                space_before = max(space_before - previous_space, 0)
+            previous_space = flowable.getSpaceAfter()
+            first_page_height -= (space_before + flowable.wrap(doc.width, frame_height)[1]
+                                  + previous_space)
+        
+        def table_chunks() -> Iterator["LongTable"]:
+            row_iter = iter(safe_rows)
+            pending = next(row_iter, None)
+            available = first_page_height
+            while pending is not None:
+                # Фрагмент заполняет страницу целиком, поэтому следующий
+                # начинается с новой страницы и заголовок на ней ровно один
+                chunk: List[List[str]] = []
+                used = header_height
+                while pending is not None:
+                    lines = max((cell.count('\n') for cell in pending), default=0) + 1
+                    height = row_height + (lines - 1) * line_height
+                    if chunk and used + height > available + 1e-6:
+                        break
+                    if not chunk and used + height > available + 1e-6 and available < frame_height:
+                        # На первой странице не осталось места даже под одну строку
+                        available = frame_height
+                        continue
+                    chunk.append(pending)
+                    used += height
+                    pending = next(row_iter, None)
+                available = frame_height
+                
+                table = LongTable([safe_columns] + chunk, colWidths=col_widths, repeatRows=1)
+                table.setStyle(table_style)
+                yield table
+        
+        story = _LazyStory(story, table_chunks())
+        
+        # Строим PDF: в ReportLab верстка и запись выполняются одним вызовом build
+        with Instrumentation.phase('layout', backend='reportlab', rows=len(rows),
+                                   includes_write=True) as metrics:
+            doc.build(story)
+            metrics['pages'] = doc.page
+            metrics['output_bytes'] = os.path.getsize(pdf_path)
+        
+        return pdf_path
+    
+    def _generate_fast_pdf(self, columns: List[str], rows: Iterable[List[str]],
+                           pdf_path: str, filename: str) -> str:
+        """Рисует таблицу прямо на страницах PDF, без HTML/CSS и platypus
+        
+        Высота строки фиксирована на весь документ: текст ячейки переносится по
+        словам не более чем в FAST_MAX_LINES строк, остаток обрезается многоточием.
+        Числа не обрезаются: не поместившееся число выводится меньшим шрифтом.
+        Поэтому число строк на странице известно заранее, а каждая страница
+        записывается в файл сразу - память не зависит от количества строк.
+        """
+        page_width, page_height = 595.2755905511812, 841.8897637795277  # A4
+        margin = self.FAST_MARGIN
+        padding = self.FAST_CELL_PADDING
+        line_height = self.FAST_LINE_HEIGHT
+        font_size = self.FAST_FONT_SIZE
+        header_font_size = self.FAST_HEADER_FONT_SIZE
+        
+        # Шрифт с поддержкой кириллицы загружается один раз на процесс
+        font_name = FontRegistry.get_font_name() if REPORTLAB_AVAILABLE else FontRegistry.DEFAULT_FONT
+        font = FontRegistry.get_font(font_name) if REPORTLAB_AVAILABLE else None
+        ellipsis = '...' if font is not None and 0x2026 not in font.face.charToGlyph else '\u2026'
+        
+        # Одноразовый итератор нельзя пройти дважды: выборка возвращается в начало потока
+        sample = ColumnWidthPlanner.sample_rows(rows)
+        if isinstance(rows, RowSource):
+            # Не считаем строки отдельным проходом: без количества не выводятся
+            # только число записей и общее число страниц
+            row_count = rows.known_len()
+        else:
+            row_count = len(rows) if hasattr(rows, '__len__') else None
+        if iter(rows) is rows:
+            rows = chain(sample, rows)
+        
+        with Instrumentation.phase('columns', backend='fast') as metrics:
+            col_widths = ColumnWidthPlanner.plan(columns, sample, page_width - 2 * margin, font_name,
+                                                 font_size=font_size, header_font_size=header_font_size,
+                                                 padding=2 * padding)
+            metrics['columns'] = len(col_widths)
+        
+        def fit(text: str, width: float, size: float, max_lines: int) -> List[str]:
+            """Разбивает текст ячейки на строки, обрезая не поместившийся остаток"""
+            width += 0.01  # погрешность округления при вычитании отступов
+            if not text.isprintable():
+                text = ''.join(char if char.isprintable() else ' ' for char in text)
+            if ColumnWidthPlanner.text_width(text, font_name, size) <= width:
+                return [text]
+            
+            lines = []
+            while len(lines) < max_lines - 1:
+                cut = ColumnWidthPlanner.fit_prefix(text, width, font_name, size)
+                if cut >= len(text):
+                    break
+                space = text.rfind(' ', 0, cut + 1)
+                cut = space if space > 0 else max(cut, 1)
+                lines.append(text[:cut].rstrip())
+                text = text[cut:].lstrip()
+            
+            if ColumnWidthPlanner.text_width(text, font_name, size) > width:
+                room = width - ColumnWidthPlanner.text_width(ellipsis, font_name, size)
+                text = text[:ColumnWidthPlanner.fit_prefix(text, room, font_name, size)].rstrip() + ellipsis
+            lines.append(text)
+            return lines
+        
+        text_widths = [width - 2 * padding for width in col_widths]
+        
+        # Высота строки таблицы одна на весь документ - по выборке строк
+        lines_per_row = 1
+        for row in sample:
+            for value, width in zip(row, text_widths):
+                value = format_cell(value)
+                if self.FAST_NUMBER.fullmatch(value):
+                    continue  # числа всегда выводятся в одну строку
+                lines_per_row = max(lines_per_row, len(fit(value, width, font_size, self.FAST_MAX_LINES)))
+        
+        header_height = line_height + 2 * padding
+        row_height = lines_per_row * line_height + 2 * padding
+        title_height = 48
+        bottom = margin + 12  # место для номера страницы
+        capacity_first = max(1, int((page_height - margin - title_height - bottom - header_height) // row_height))
+        capacity = max(1, int((page_height - margin - bottom - header_height) // row_height))
+        total_pages = None
+        if row_count is not None:
+            total_pages = 1 + max(0, -(-(row_count - capacity_first) // capacity))
         
-        story.append(table)
+        table_width = sum(col_widths)
+        col_left = [margin + sum(col_widths[:index]) for index in range(len(col_widths))]
+        col_text_x = [b"%.2f" % (left + padding) for left in col_left]
+        boundaries = col_left + [margin + table_width]
         
-        # Строим PDF
-        doc.build(story)
+        def baseline(top: float, line: int, size: float) -> bytes:
+            """Базовая линия строки текста line в ячейке с верхним краем top"""
+            return b"%.2f" % (top - padding - line * line_height - line_height / 2 - size * 0.35)
+        
+        timestamp = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        info = f"Файл: {filename}    Колонок: {len(columns)}    Сгенерировано: {timestamp}"
+        if row_count is not None:
+            info = f"Файл: {filename}    Записей: {row_count}    Колонок: {len(columns)}    Сгенерировано: {timestamp}"
+        
+        with Instrumentation.phase('layout', backend='fast', rows=row_count,
+                                   includes_write=True) as metrics, \
+                open(pdf_path, 'wb') as file:
+            writer = StreamingPDFWriter(file, (page_width, page_height), font_name)
+            
+            def centered(text: str, size: float, y: float) -> bytes:
+                x = (page_width - ColumnWidthPlanner.text_width(text, font_name, size)) / 2
+                return b"/F1 %.1f Tf 1 0 0 1 %.2f %.2f Tm %s Tj" % (size, x, y, writer.encode_text(text))
+            
+            header_cells = [writer.encode_text(fit(str(column), width, header_font_size, 1)[0])
+                            for column, width in zip(columns, text_widths)]
+            
+            # Подготовленные ячейки: (колонка, значение) -> (закодированные строки
+            # текста, команда смены шрифта для уменьшенного числа или None)
+            cells: Dict[Tuple[int, str], Tuple[List[bytes], Optional[bytes]]] = {}
+            
+            row_iter = iter(rows)
+            written = 0
+            first = True
+            while True:
+                page_capacity = capacity_first if first else capacity
+                page_rows = list(islice(row_iter, page_capacity))
+                if not page_rows and not first:
+                    break
+                written += len(page_rows)
+                
+                page_number = writer.page_count + 1
+                top = page_height - margin - (title_height if first else 0)
+                parts = []
+                
+                # Фон заголовка и сетка таблицы
+                table_bottom = top - header_height - row_height * len(page_rows)
+                parts.append(b"0.17 0.24 0.5 rg %.2f %.2f %.2f %.2f re f"
+                             % (margin, top - header_height, table_width, header_height))
+                parts.append(b"0.5 w 0 G")
+                for index in range(len(page_rows) + 2):
+                    y = top if index == 0 else top - header_height - (index - 1) * row_height
+                    parts.append(b"%.2f %.2f m %.2f %.2f l" % (margin, y, margin + table_width, y))
+                for x in boundaries:
+                    parts.append(b"%.2f %.2f m %.2f %.2f l" % (x, top, x, table_bottom))
+                parts.append(b"S")
+                
+                parts.append(b"BT 0 g")
+                if first:
+                    parts.append(centered("Данные из файла", 16, page_height - margin - 16))
+                    parts.append(centered(info, font_size, page_height - margin - 34))
+                
+                # Заголовки колонок повторяются на каждой странице
+                parts.append(b"1 g /F1 %.1f Tf" % header_font_size)
+                y = baseline(top, 0, header_font_size)
+                for x, encoded in zip(col_text_x, header_cells):
+                    parts.append(b"1 0 0 1 " + x + b" " + y + b" Tm " + encoded + b" Tj")
+                
+                parts.append(b"0 g /F1 %.1f Tf" % font_size)
+                for row_index, row in enumerate(page_rows):
+                    row_top = top - header_height - row_index * row_height
+                    ys = [baseline(row_top, line, font_size) for line in range(lines_per_row)]
+                    for index, value in enumerate(row[:len(text_widths)]):
+                        if value.__class__ is not str:
+                            value = format_cell(value)
+                        if not value:
+                            continue
+                        cell = cells.get((index, value))
+                        if cell is None:
+                            if len(cells) >= self.FAST_CELL_CACHE:
+                                cells.clear()
+                            width = text_widths[index]
+                            text_width = ColumnWidthPlanner.text_width(value, font_name, font_size)
+                            if text_width > width + 0.01 and self.FAST_NUMBER.fullmatch(value):
+                                size = font_size * width / text_width
+                                cell = ([writer.encode_text(value)], b"/F1 %.2f Tf" % size)
+                            else:
+                                cell = ([writer.encode_text(line)
+                                         for line in fit(value, width, font_size, lines_per_row)], None)
+                            cells[(index, value)] = cell
+                        lines, shrink = cell
+                        x = col_text_x[index]
+                        if shrink is not None:
+                            parts.append(shrink)
+                        for y, encoded in zip(ys, lines):
+                            parts.append(b"1 0 0 1 " + x + b" " + y + b" Tm " + encoded + b" Tj")
+                        if shrink is not None:
+                            parts.append(b"/F1 %.1f Tf" % font_size)
+                
+                number = f"{page_number} / {total_pages}" if total_pages else str(page_number)
+                parts.append(centered(number, font_size, margin))
+                parts.append(b"ET")
+                
+                writer.add_page(b"\n".join(parts))
+                first = False
+                if len(page_rows) < page_capacity:
+                    break
+            
+            writer.close()
+            file.flush()
+            metrics['pages'] = writer.page_count
+            metrics['rows'] = written
+            metrics['output_bytes'] = os.path.getsize(pdf_path)
+            metrics['font_full_bytes'], metrics['font_bytes'] = writer.font_bytes
         
+        self.rendered_rows = written        
+        full_font, font = writer.font_bytes
+        if full_font > font:
+            print(f"🗜️  Подмножество шрифта: {full_font / 1024:.1f} КБ -> {font / 1024:.1f} КБ")
+        print(f"✅ PDF создан быстрым табличным backend-ом ({writer.page_count} стр.)")
         return pdf_path
 
 
 class FileScanner:
     """Класс для сканирования директорий и поиска файлов данных"""
     
-    SUPPORTED_EXTENSIONS = {
-        '.csv': 'CSV файл',
-        '.json': 'JSON файл',
-        '.xlsx': 'Excel файл',
-        '.xls': 'Excel файл',
-        '.docx': 'Word файл',
-        '.doc': 'Word файл',
-        '.txt': 'Текстовый файл'
-    }
+    SUPPORTED_EXTENSIONS = {
+        '.csv': 'CSV файл',
+        '.json': 'JSON файл',
+        '.ndjson': 'NDJSON файл',
+        '.jsonl': 'NDJSON файл',
+        '.xlsx': 'Excel файл',
+        '.xls': 'Excel файл',
+        '.docx': 'Word файл',
+        '.doc': 'Word файл',
+        '.txt': 'Текстовый файл'
+    }
+    
+    # Директории, в которых не бывает входных данных: окружения, VCS, результаты
+    DEFAULT_EXCLUDES = frozenset({
+        '.git', '.hg', '.svn', 'venv', '.venv', 'env', 'output', '__pycache__',
+        'node_modules', '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache',
+    })
+    
+    # Постоянный индекс директорий между запусками
+    INDEX_PATH = os.path.join(CACHE_DIR, 'file_index.json')
+    
+    @staticmethod
+    def _load_index() -> Dict[str, Dict[str, Any]]:
+        """Загружает индекс директорий, при ошибке начинает с пустого"""
+        try:
+            with open(FileScanner.INDEX_PATH, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _save_index(index: Dict[str, Dict[str, Any]]):
+        """Атомарно сохраняет индекс директорий"""
+        try:
+            os.makedirs(os.path.dirname(FileScanner.INDEX_PATH), exist_ok=True)
+            temp_path = f"{FileScanner.INDEX_PATH}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(index, file, ensure_ascii=False)
+            os.replace(temp_path, FileScanner.INDEX_PATH)
+        except OSError as e:
+            print(f"⚠️  Не удалось сохранить индекс файлов: {e}")
+    
+    @staticmethod
+    def _scan_one(directory: str, dir_mtime: int) -> Dict[str, Any]:
+        """Читает одну директорию через scandir: поддерживаемые файлы и поддиректории"""
+        files = []
+        dirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # Как os.walk: по символическим ссылкам на директории не переходим
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in FileScanner.SUPPORTED_EXTENSIONS \
+                            and entry.is_file():
+                        stat = entry.stat()
+                        files.append([entry.name, stat.st_mtime_ns, stat.st_size])
+                except OSError:
+                    continue
+        
+        files.sort()
+        dirs.sort()
+        return {'mtime': dir_mtime, 'files': files, 'dirs': dirs}
+    
+    @staticmethod
+    def scan_directories(directories: List[str], excludes: Optional[Iterable[str]] = None,
+                         use_index: bool = True) -> List[Tuple[str, str, str]]:
+        """Сканирует указанные директории и возвращает список файлов
+        
+        Каждая директория просматривается один раз, даже если она вложена в
+        другую из списка. Для директорий, mtime которых не изменился с прошлого
+        запуска, список файлов (путь, mtime, размер) берется из индекса без scandir.
+        """
+        with Instrumentation.phase('scan', directories=list(directories)) as metrics:
+            files = FileScanner._scan(directories, excludes, use_index)
+            metrics['files'] = len(files)
+        return files
     
     @staticmethod
-    def scan_directories(directories: List[str]) -> List[Tuple[str, str, str]]:
-        """Сканирует указанные директории и возвращает список файлов"""
+    def _scan(directories: List[str], excludes: Optional[Iterable[str]],
+              use_index: bool) -> List[Tuple[str, str, str]]:
+        """Обход директорий с использованием индекса"""
+        excludes = FileScanner.DEFAULT_EXCLUDES if excludes is None else frozenset(excludes)
+        supported = FileScanner.SUPPORTED_EXTENSIONS
+        index = FileScanner._load_index() if use_index else {}
+        changed = False
+        visited = set()
         files = []
         
         for directory in directories:
@@ -395,14 +2868,44 @@ class FileScanner:
                 print(f"Директория не существует: {directory}")
                 continue
             
-            for root, dirs, filenames in os.walk(directory):
-                for filename in filenames:
-                    file_path = os.path.join(root, filename)
-                    ext = os.path.splitext(filename)[1].lower()
-                    
-                    if ext in FileScanner.SUPPORTED_EXTENSIONS:
-                        file_type = FileScanner.SUPPORTED_EXTENSIONS[ext]
-                        files.append((file_path, filename, file_type))
+            # realpath только для корня: по ссылкам не переходим, поэтому
+            # реальный путь поддиректории - это путь родителя плюс имя
+            root_real = os.path.realpath(directory)
+            stack = [(directory, root_real)]
+            while stack:
+                current, current_real = stack.pop()
+                if current_real in visited:
+                    continue
+                visited.add(current_real)
+                
+                try:
+                    dir_mtime = os.stat(current).st_mtime_ns
+                    listing = index.get(current_real)
+                    if listing is None or listing.get('mtime') != dir_mtime:
+                        listing = FileScanner._scan_one(current, dir_mtime)
+                        index[current_real] = listing
+                        changed = True
+                except OSError:
+                    continue
+                
+                prefix = current + os.sep
+                for filename, mtime, size in listing['files']:
+                    file_type = supported[filename[filename.rfind('.'):].lower()]
+                    files.append((prefix + filename, filename, file_type))
+                
+                # В обратном порядке, чтобы обход шел по алфавиту
+                for name in reversed(listing['dirs']):
+                    if name not in excludes:
+                        stack.append((prefix + name, os.path.join(current_real, name)))
+            
+            # Удаляем из индекса исчезнувшие поддиректории этого корня
+            prefix = root_real.rstrip(os.sep) + os.sep
+            for stale in [path for path in index if path.startswith(prefix) and path not in visited]:
+                del index[stale]
+                changed = True
+        
+        if use_index and changed:
+            FileScanner._save_index(index)
         
         return files
 
@@ -465,16 +2968,1095 @@ class SystemUtils:
             print(f"Ошибка открытия PDF: {e}")
 
 
-def main():
+class OutputCache:
+    """Контентно-адресуемый кэш готовых PDF
+    
+    Ключ - хэш содержимого входного файла, шаблона, параметров чтения и версий
+    генератора и backend-а. При совпадении ключа PDF копируется из кэша без
+    повторного чтения и рендеринга. Размер кэша ограничивается вытеснением
+    давно не использованных файлов (LRU по mtime).
+    """
+    
+    # Размер кэша по умолчанию
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+    
+    # Размер блока при хэшировании файлов
+    HASH_BLOCK = 1024 * 1024
+    
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or os.path.join(CACHE_DIR, 'pdf')
+        self.max_bytes = max_bytes
+    
+    @staticmethod
+    def _hash_file(digest: "hashlib._Hash", file_path: str):
+        """Добавляет содержимое файла в хэш блоками"""
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(OutputCache.HASH_BLOCK), b''):
+                digest.update(block)
+    
+    @staticmethod
+    def backend_version(backend: Optional[str] = None) -> str:
+        """Возвращает идентификатор backend-а, который будет использован для рендеринга"""
+        from importlib import metadata
+        
+        if backend is None:
+            backend = 'weasyprint' if USE_WEASYPRINT else 'reportlab'
+        # Быстрый backend использует разбор шрифтов ReportLab
+        package = 'weasyprint' if backend == 'weasyprint' else 'reportlab'
+        try:
+            return f"{backend}:{package}-{metadata.version(package)}"
+        except metadata.PackageNotFoundError:
+            return f"{backend}:{package}-unknown"
+    
+    @staticmethod
+    def make_key(file_path: str, template_path: str, options: Dict[str, Any]) -> str:
+        """Вычисляет ключ кэша для конвертации файла"""
+        digest = hashlib.sha256()
+        # Код генератора тоже входит в ключ: после обновления кэш не используется
+        paths = [file_path, template_path, os.path.abspath(__file__)]
+        stylesheet = WeasyPrintStyles.stylesheet_path(template_path)
+        if os.path.exists(stylesheet):
+            paths.append(stylesheet)
+        for path in paths:
+            OutputCache._hash_file(digest, path)
+            digest.update(b'\0')
+        
+        options = dict(options, backend=OutputCache.backend_version(options.get('backend')))
+        digest.update(json.dumps(options, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def conversion_key(file_path: str, file_type: str, template_path: str, separator: Optional[str],
+                       chunk_rows: int = 0, backend: Optional[str] = None) -> str:
+        """Вычисляет ключ кэша с параметрами конвертации convert_file"""
+        return OutputCache.make_key(file_path, template_path, {
+            'file_type': file_type,
+            'separator': separator,
+            'chunk_rows': chunk_rows,
+            'backend': backend,
+            # При автоматическом выборе результат зависит от модели и порогов
+            'selector': BackendSelector.model() if backend is None else None,
+            'optimize': PDFOptimizer.enabled(),
+        })
+    
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+    
+    def fetch(self, key: str, pdf_path: str) -> bool:
+        """Копирует PDF из кэша в pdf_path, возвращает False при промахе"""
+        entry_path = self._entry_path(key)
+        try:
+            shutil.copyfile(entry_path, pdf_path)
+            # Обновляем mtime - запись становится самой свежей для вытеснения
+            os.utime(entry_path)
+            return True
+        except OSError:
+            return False
+    
+    def store(self, key: str, pdf_path: str):
+        """Сохраняет готовый PDF в кэш (атомарно, безопасно для параллельных процессов)"""
+        entry_path = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(pdf_path, temp_path)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            print(f"⚠️  Не удалось сохранить PDF в кэш: {e}")
+    
+    def evict(self) -> int:
+        """Удаляет самые старые записи, пока кэш не уложится в max_bytes; возвращает число удаленных"""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+def convert_file(file_path: str, file_type: str, output_dir: str, base_filename: str,
+                 template_path: str, separator: Optional[str] = None, chunk_rows: int = 0,
+                 workers: Optional[int] = None, cache: Optional[OutputCache] = None,
+                 backend: Optional[str] = None) -> str:
+    """Конвертирует файл данных в PDF и возвращает путь к PDF
+    
+    Если передан кэш и входные данные не менялись, PDF берется из кэша.
+    backend задает генератор явно (см. PDFGenerator.BACKENDS).
+    """
+    with Instrumentation.phase('convert', file=file_path, file_type=file_type) as metrics:
+        pdf_path = os.path.join(output_dir, f"{base_filename}.pdf")
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.conversion_key(file_path, file_type, template_path, separator,
+                                             chunk_rows, backend)
+            if cache.fetch(cache_key, pdf_path):
+                print(f"♻️  Данные не изменились, PDF взят из кэша: {pdf_path}")
+                metrics['cache_hit'] = True
+                metrics['output_bytes'] = os.path.getsize(pdf_path)
+                return pdf_path
+        
+        # Файл разбирается один раз в колоночную таблицу: повторяющиеся значения
+        # хранятся в словарях колонок, а backend-ы не перечитывают файл.
+        # Быстрый backend читает строки потоком с постоянной памятью. При
+        # автоматическом выборе стоимость оценивается по размеру файла и выборке
+        # строк, а таблица строится один раз - если выбран не быстрый backend.
+        auto = backend is None
+        with Instrumentation.phase('read', file=file_path, file_type=file_type) as read_metrics:
+            if backend in ('weasyprint', 'reportlab'):
+                columns, rows = DataReader.read_table(file_path, file_type, separator, workers)
+            else:
+                columns, rows = DataReader.stream(file_path, file_type, separator, workers)
+                if auto and columns:
+                    backend = BackendSelector.choose(columns, rows)
+                    if backend != 'fast':
+                        rows = ColumnarTable.from_rows(columns, rows)
+                        columns = rows.columns
+            # Количество строк потокового источника не считается отдельным
+            # проходом: его сообщает быстрый backend после рендеринга
+            row_count = rows.known_len() if isinstance(rows, RowSource) else len(rows)
+            if isinstance(rows, ColumnarTable):
+                read_metrics['table_bytes'] = rows.memory_bytes()
+            if row_count is not None:
+                read_metrics['rows'] = row_count
+            read_metrics['columns'] = len(columns)
+        
+        empty = row_count == 0 if row_count is not None else rows.is_empty()
+        if not columns or empty:
+            raise Exception("Файл не содержит данных")
+        
+        if row_count is not None:
+            print(f"Прочитано {row_count} строк с {len(columns)} колонками")
+        
+        generator = PDFGenerator(template_path, chunk_rows=chunk_rows, workers=workers)
+        pdf_path = generator.generate_pdf(columns, rows, output_dir, base_filename, backend=backend,
+                                          fallback=auto)
+        
+        if row_count is None:
+            row_count = generator.rendered_rows
+            print(f"Прочитано {row_count} строк с {generator.rendered_columns} колонками")
+        
+        if cache is not None:
+            cache.store(cache_key, pdf_path)
+        
+        metrics['cache_hit'] = False
+        metrics['rows'] = row_count
+        metrics['output_bytes'] = os.path.getsize(pdf_path)
+        return pdf_path
+
+
+def _convert_file_worker(file_path: str, file_type: str, output_dir: str, base_filename: str,
+                         template_path: str, separator: Optional[str], cache: Optional[OutputCache],
+                         backend: Optional[str] = None) -> Tuple[str, bool, float, str]:
+    """Конвертирует один файл в PDF (выполняется в процессе-воркере пакетного режима)
+    
+    Возвращает (путь к файлу, успех, время в секундах, путь к PDF или текст ошибки).
+    Параллелизм дает пул воркеров, поэтому внутри файла разбор и рендеринг
+    идут в одном процессе (workers=1), иначе процессов было бы jobs x ядер.
+    """
+    started = time.perf_counter()
+    try:
+        pdf_path = convert_file(file_path, file_type, output_dir, base_filename, template_path,
+                                separator, workers=1, cache=cache, backend=backend)
+        return file_path, True, time.perf_counter() - started, pdf_path
+    except Exception as e:
+        return file_path, False, time.perf_counter() - started, str(e)
+
+
+class BatchConverter:
+    """Неинтерактивная пакетная конвертация файлов в пуле процессов"""
+    
+    @staticmethod
+    def collect_files(patterns: List[str]) -> List[Tuple[str, str, str]]:
+        """Собирает файлы по списку директорий и glob-шаблонов без повторов"""
+        files = []
+        seen = set()
+        
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                found = FileScanner.scan_directories([pattern])
+            else:
+                found = []
+                for file_path in sorted(glob.glob(pattern, recursive=True)):
+                    filename = os.path.basename(file_path)
+                    ext = os.path.splitext(filename)[1].lower()
+                    if os.path.isfile(file_path) and ext in FileScanner.SUPPORTED_EXTENSIONS:
+                        found.append((file_path, filename, FileScanner.SUPPORTED_EXTENSIONS[ext]))
+                if not found:
+                    print(f"Нет подходящих файлов: {pattern}")
+            
+            for file_info in found:
+                key = os.path.abspath(file_info[0])
+                if key not in seen:
+                    seen.add(key)
+                    files.append(file_info)
+        
+        return files
+    
+    @staticmethod
+    def unique_name(filename: str, used: set) -> str:
+        """Подбирает уникальное имя PDF, чтобы файлы с одинаковым именем не перезаписывали друг друга"""
+        stem, ext = os.path.splitext(filename)
+        name = stem
+        if name in used:
+            name = f"{stem}_{ext.lstrip('.')}"
+        suffix = 2
+        while name in used:
+            name = f"{stem}_{suffix}"
+            suffix += 1
+        used.add(name)
+        return name
+    
+    @staticmethod
+    def convert_all(patterns: List[str], output_dir: str, template_path: str,
+                    jobs: Optional[int] = None, separator: Optional[str] = None,
+                    cache: Optional[OutputCache] = None,
+                    backend: Optional[str] = None) -> List[Tuple[str, bool, float, str]]:
+        """Находит и конвертирует все файлы, возвращает результаты в порядке сканирования"""
+        import asyncio
+        
+        pipeline = BatchPipeline(output_dir, template_path, jobs, separator, cache, backend)
+        return asyncio.run(pipeline.run(patterns))
+    
+    @staticmethod
+    def print_report(results: List[Tuple[str, bool, float, str]], total_time: float):
+        """Выводит итоговый отчет пакетной конвертации"""
+        failed = [result for result in results if not result[1]]
+        
+        print("\n" + "=" * 80)
+        print("Отчет пакетной конвертации")
+        print("-" * 80)
+        for file_path, ok, elapsed, detail in results:
+            status = "OK    " if ok else "ОШИБКА"
+            print(f"{status} {elapsed:8.2f} с  {file_path} -> {detail}")
+        print("-" * 80)
+        print(f"Всего файлов: {len(results)}, успешно: {len(results) - len(failed)}, "
+              f"с ошибками: {len(failed)}")
+        print(f"Общее время: {total_time:.2f} с, суммарное время конвертации: "
+              f"{sum(result[2] for result in results):.2f} с")
+        print("=" * 80)
+
+
+class BatchPipeline:
+    """Асинхронный конвейер пакетной конвертации: scan -> read -> render -> write
+    
+    Стадии связаны ограниченными очередями, поэтому сканирование, чтение
+    входных файлов, рендеринг в пуле процессов и запись готовых PDF разных
+    документов идут одновременно, а число документов в работе не превышает
+    размер очередей. Чтение (ключ и проверка кэша, упреждающее чтение файла)
+    и запись (перенос PDF в output, сохранение в кэш) выполняются в потоках,
+    рендеринг - в процессах.
+    """
+    
+    # Емкость очереди между стадиями на один процесс рендеринга
+    QUEUE_SIZE_PER_JOB = 2
+    
+    # Потоков записи готовых PDF
+    WRITERS = 2
+    
+    def __init__(self, output_dir: str, template_path: str, jobs: Optional[int] = None,
+                 separator: Optional[str] = None, cache: Optional[OutputCache] = None,
+                 backend: Optional[str] = None):
+        self.output_dir = output_dir
+        self.template_path = template_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.separator = separator
+        self.cache = cache
+        self.backend = backend
+        self.results: Dict[int, Tuple[str, bool, float, str]] = {}
+        self.total = 0
+    
+    async def run(self, patterns: List[str]) -> List[Tuple[str, bool, float, str]]:
+        """Запускает все стадии и ждет их завершения"""
+        import asyncio
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        
+        queue_size = self.jobs * self.QUEUE_SIZE_PER_JOB
+        scanned = asyncio.Queue(maxsize=queue_size)
+        read = asyncio.Queue(maxsize=queue_size)
+        rendered = asyncio.Queue(maxsize=queue_size)
+        
+        # Временная директория внутри output: готовый PDF переносится
+        # переименованием, а не второй записью на другой диск или в tmpfs
+        os.makedirs(self.output_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=self.jobs) as processes, \
+                ThreadPoolExecutor(max_workers=self.jobs + self.WRITERS) as threads, \
+                tempfile.TemporaryDirectory(prefix='.dataforgepdf-', dir=self.output_dir) as temp_dir:
+            loop = asyncio.get_running_loop()
+            
+            def in_thread(func: Callable, *args) -> "asyncio.Future":
+                return loop.run_in_executor(threads, func, *args)
+            
+            async def render(item: Tuple) -> Optional[Tuple]:
+                index, file_path, file_type, name, cache_key, spent = item
+                try:
+                    # Кэш проверен на стадии чтения, поэтому воркер рендерит без него
+                    _, ok, elapsed, detail = await loop.run_in_executor(
+                        processes, _convert_file_worker, file_path, file_type, temp_dir, name,
+                        self.template_path, self.separator, None, self.backend)
+                except Exception as e:
+                    ok, elapsed, detail = False, 0.0, str(e)
+                if not ok:
+                    self._finish(index, file_path, False, spent + elapsed, detail)
+                    return None
+                return index, file_path, detail, cache_key, spent + elapsed
+            
+            await asyncio.gather(
+                self._scan(patterns, scanned, in_thread),
+                self._stage(scanned, read, lambda item: self._read(item, in_thread),
+                            self.jobs, self.jobs),
+                self._stage(read, rendered, render, self.jobs, self.WRITERS),
+                self._stage(rendered, None, lambda item: self._write(item, in_thread),
+                            self.WRITERS, 0),
+            )
+        
+        return [self.results[index] for index in range(self.total)]
+    
+    async def _scan(self, patterns: List[str], outbox: "asyncio.Queue", in_thread: Callable):
+        """Стадия сканирования: находит файлы и подбирает им имена PDF"""
+        try:
+            print("Сканирование директорий...")
+            files = await in_thread(BatchConverter.collect_files, patterns)
+            self.total = len(files)
+            if files:
+                print(f"Найдено файлов: {len(files)}, процессов: {self.jobs}")
+            
+            used = set()
+            for index, (file_path, filename, file_type) in enumerate(files):
+                name = BatchConverter.unique_name(filename, used)
+                await outbox.put((index, file_path, file_type, name))
+        finally:
+            for _ in range(self.jobs):
+                await outbox.put(None)
+    
+    @staticmethod
+    async def _stage(inbox: "asyncio.Queue", outbox: Optional["asyncio.Queue"],
+                     handler: Callable, workers: int, next_workers: int):
+        """Обрабатывает элементы очереди в workers задачах и передает результаты дальше
+        
+        None в очереди - признак конца: каждая задача завершается на нем, а после
+        завершения всех задач стадия передает по None каждой задаче следующей.
+        """
+        import asyncio
+        
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    return
+                result = await handler(item)
+                if result is not None and outbox is not None:
+                    await outbox.put(result)
+        
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            if outbox is not None:
+                for _ in range(next_workers):
+                    await outbox.put(None)
+    
+    async def _read(self, item: Tuple, in_thread: Callable) -> Optional[Tuple]:
+        """Стадия чтения: проверяет кэш и заранее подгружает файл для рендеринга"""
+        index, file_path, file_type, name = item
+        started = time.perf_counter()
+        try:
+            cache_key = None
+            if self.cache is not None:
+                # Хэширование читает файл целиком, заодно прогревая page cache
+                cache_key = await in_thread(OutputCache.conversion_key, file_path, file_type,
+                                            self.template_path, self.separator, 0, self.backend)
+                pdf_path = os.path.join(self.output_dir, f"{name}.pdf")
+                if await in_thread(self.cache.fetch, cache_key, pdf_path):
+                    print(f"♻️  Данные не изменились, PDF взят из кэша: {pdf_path}")
+                    self._finish(index, file_path, True, time.perf_counter() - started, pdf_path)
+                    return None
+            else:
+                await in_thread(self._prefetch, file_path)
+        except Exception as e:
+            self._finish(index, file_path, False, time.perf_counter() - started, str(e))
+            return None
+        return index, file_path, file_type, name, cache_key, time.perf_counter() - started
+    
+    @staticmethod
+    def _prefetch(file_path: str):
+        """Просит ОС заранее прочитать файл с диска, пока воркеры заняты другими документами"""
+        if not hasattr(os, 'posix_fadvise'):
+            return  # Windows, macOS
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    
+    async def _write(self, item: Tuple, in_thread: Callable) -> None:
+        """Стадия записи: переносит готовый PDF в output и сохраняет его в кэш"""
+        index, file_path, temp_pdf, cache_key, spent = item
+        pdf_path = os.path.join(self.output_dir, os.path.basename(temp_pdf))
+        started = time.perf_counter()
+        try:
+            await in_thread(shutil.move, temp_pdf, pdf_path)
+            if self.cache is not None:
+                await in_thread(self.cache.store, cache_key, pdf_path)
+        except Exception as e:
+            self._finish(index, file_path, False, spent + time.perf_counter() - started, str(e))
+            return None
+        self._finish(index, file_path, True, spent + time.perf_counter() - started, pdf_path)
+        return None
+    
+    def _finish(self, index: int, file_path: str, ok: bool, elapsed: float, detail: str):
+        """Фиксирует результат конвертации файла
+        
+        elapsed - время работы стадий над файлом без ожидания в очередях.
+        """
+        self.results[index] = (file_path, ok, elapsed, detail)
+        status = "✅" if ok else "❌"
+        print(f"[{len(self.results)}/{self.total}] {status} {file_path} ({elapsed:.2f} с)")
+
+
+def _warm_render_worker(template_path: str):
+    """Инициализатор воркера сервиса: заранее загружает шаблон, шрифты и backend"""
+    get_template(template_path)
+    if REPORTLAB_AVAILABLE:
+        import reportlab.platypus  # noqa: F401
+        FontRegistry.get_font_name()
+    if USE_WEASYPRINT:
+        try:
+            WeasyPrintStyles.get(template_path)
+        except Exception as e:
+            print(f"⚠️  WeasyPrint не загружен в воркере: {e}")
+
+
+def _render_service_worker(file_path: str, file_type: str, name: str, template_path: str,
+                           separator: Optional[str], cache: Optional[OutputCache],
+                           backend: Optional[str] = None) -> bytes:
+    """Рендерит файл в PDF и возвращает его содержимое (выполняется в прогретом воркере)
+    
+    Запросы распределяются по воркерам сервиса, поэтому файл обрабатывается в
+    одном процессе (workers=1).
+    """
+    with tempfile.TemporaryDirectory(prefix='dataforgepdf-') as output_dir:
+        pdf_path = convert_file(file_path, file_type, output_dir, name, template_path,
+                                separator, workers=1, cache=cache, backend=backend)
+        with open(pdf_path, 'rb') as file:
+            return file.read()
+
+
+class RenderService:
+    """Локальный HTTP-сервис рендеринга с пулом прогретых воркеров
+    
+    Воркеры запускаются один раз и держат в памяти импортированные backend-ы,
+    шрифты и скомпилированный шаблон, поэтому время ответа - это чистое время
+    чтения и рендеринга документа.
+    
+    POST /render?type=csv&name=report[&separator=;]  - тело запроса - содержимое файла
+    POST /render?path=/data/report.csv               - файл на диске сервера
+    GET  /health                                     - состояние сервиса
+    
+    Файлы на диске сервера доступны только внутри data_roots (после
+    разрешения символических ссылок); без data_roots параметр path отключен.
+    """
+    
+    # Максимальный размер загружаемого файла
+    MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+    
+    def __init__(self, template_path: str, workers: Optional[int] = None,
+                 cache: Optional[OutputCache] = None, backend: Optional[str] = None,
+                 data_roots: Optional[List[str]] = None):
+        from concurrent.futures import ProcessPoolExecutor
+        
+        self.template_path = os.path.abspath(template_path)
+        self.data_roots = [os.path.realpath(root) for root in data_roots or []]
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.backend = backend
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_render_worker,
+                                            initargs=(self.template_path,))
+        # Пул создает процессы лениво - запускаем их сразу, чтобы первый запрос не ждал прогрева
+        for future in [self.executor.submit(time.sleep, 0) for _ in range(self.workers)]:
+            future.result()
+    
+    @staticmethod
+    def safe_name(name: str) -> str:
+        """Сводит имя документа из запроса к безопасному имени файла без пути
+        
+        Отбрасываются директории, разделители путей и управляющие символы, чтобы
+        имя не выводило PDF за пределы временной директории и не ломало заголовки.
+        """
+        name = os.path.basename(name.replace('\\', '/'))
+        name = ''.join(char for char in name if char.isprintable() and char not in '/\\')
+        name = name.strip().lstrip('.')
+        return name or 'document'
+    
+    @staticmethod
+    def content_disposition(filename: str) -> str:
+        """Заголовок Content-Disposition с именем файла по RFC 6266 / RFC 5987"""
+        from urllib.parse import quote
+        
+        fallback = ''.join(char if ' ' <= char < '\x7f' and char not in '"\\' else '_'
+                           for char in filename)
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+    
+    def resolve_data_path(self, file_path: str) -> Optional[str]:
+        """Возвращает реальный путь файла, если он лежит внутри одной из data_roots, иначе None"""
+        real_path = os.path.realpath(file_path)
+        for root in self.data_roots:
+            if os.path.commonpath([root, real_path]) == root:
+                return real_path
+        return None
+    
+    def render(self, file_path: str, file_type: str, name: str, separator: Optional[str] = None) -> bytes:
+        """Рендерит файл в одном из воркеров и возвращает содержимое PDF"""
+        future = self.executor.submit(_render_service_worker, file_path, file_type, name,
+                                      self.template_path, separator, self.cache, self.backend)
+        return future.result()
+    
+    def close(self):
+        """Останавливает пул воркеров"""
+        self.executor.shutdown(wait=True)
+    
+    def serve(self, host: str, port: int):
+        """Запускает HTTP сервер до прерывания пользователем"""
+        from http.server import ThreadingHTTPServer
+        
+        server = ThreadingHTTPServer((host, port), _make_render_handler(self))
+        print(f"🚀 Сервис рендеринга слушает http://{host}:{port} (воркеров: {self.workers})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nОстановка сервиса...")
+        finally:
+            server.server_close()
+            self.close()
+
+
+def _make_render_handler(service: RenderService):
+    """Создает класс обработчика HTTP запросов для сервиса рендеринга"""
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs, urlparse
+    
+    class RenderRequestHandler(BaseHTTPRequestHandler):
+        """Обработчик запросов сервиса рендеринга"""
+        
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_GET(self):
+            if urlparse(self.path).path == '/health':
+                self._send_json(200, {'status': 'ok', 'workers': service.workers})
+            else:
+                self._send_json(404, {'error': 'Неизвестный адрес'})
+        
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/render':
+                self._send_json(404, {'error': 'Неизвестный адрес'})
+                return
+            
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            separator = params.get('separator')
+            started = time.perf_counter()
+            upload_path = None
+            try:
+                if 'path' in params:
+                    # Файл на диске сервера: только внутри разрешенных директорий
+                    if not service.data_roots:
+                        self._send_json(403, {'error': "Чтение файлов сервера отключено (см. --data-root)"})
+                        return
+                    file_path = service.resolve_data_path(params['path'])
+                    if file_path is None:
+                        self._send_json(403, {'error': f"Путь вне разрешенных директорий: {params['path']}"})
+                        return
+                    filename = os.path.basename(file_path)
+                    ext = os.path.splitext(filename)[1].lower()
+                    if not os.path.isfile(file_path):
+                        self._send_json(404, {'error': f"Файл не найден: {params['path']}"})
+                        return
+                else:
+                    # Содержимое файла в теле запроса
+                    ext = '.' + params.get('type', 'csv').lower().lstrip('.')
+                    filename = params.get('name', 'document') + ext
+                    length = int(self.headers.get('Content-Length', 0))
+                    if length <= 0 or length > RenderService.MAX_UPLOAD_BYTES:
+                        self._send_json(413 if length > 0 else 400,
+                                        {'error': "Некорректный размер тела запроса"})
+                        return
+                    if ext not in FileScanner.SUPPORTED_EXTENSIONS:
+                        self._send_json(400, {'error': f"Неподдерживаемый тип файла: {ext}"})
+                        return
+                    
+                    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as upload:
+                        upload_path = upload.name
+                        remaining = length
+                        while remaining > 0:
+                            block = self.rfile.read(min(remaining, 1024 * 1024))
+                            if not block:
+                                break
+                            upload.write(block)
+                            remaining -= len(block)
+                    file_path = upload_path
+                
+                if ext not in FileScanner.SUPPORTED_EXTENSIONS:
+                    self._send_json(400, {'error': f"Неподдерживаемый тип файла: {ext}"})
+                    return
+                
+                name = RenderService.safe_name(os.path.splitext(filename)[0])
+                pdf = service.render(file_path, FileScanner.SUPPORTED_EXTENSIONS[ext], name, separator)
+            except Exception as e:
+                self._send_json(500, {'error': str(e)})
+                return
+            finally:
+                if upload_path is not None:
+                    os.remove(upload_path)
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(pdf)))
+            self.send_header('Content-Disposition', RenderService.content_disposition(f"{name}.pdf"))
+            self.send_header('X-Render-Time', f"{time.perf_counter() - started:.3f}")
+            self.end_headers()
+            self.wfile.write(pdf)
+    
+    return RenderRequestHandler
+
+
+def _ignore_interrupt():
+    """Инициализатор воркера: Ctrl+C обрабатывает только основной процесс"""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class FileWatcher:
+    """Режим наблюдения: перерисовывает PDF только для созданных и измененных файлов
+    
+    Изменения отслеживаются через inotify (Linux, без внешних зависимостей) или,
+    если он недоступен, периодическим опросом: новые файлы находит
+    FileScanner, измененные - сравнение mtime и размера. Файл рендерится,
+    когда он не менялся debounce секунд, - так недописанные выгрузки не
+    попадают в PDF. Рендеринг идет в пуле процессов; файл, измененный во время
+    рендеринга, перерисовывается еще раз. Пока изменений нет, процесс спит в
+    select (inotify) или между опросами и почти не расходует CPU.
+    """
+    
+    DEFAULT_DEBOUNCE = 1.0
+    DEFAULT_POLL_INTERVAL = 2.0
+    
+    # Как часто проверять завершение рендеринга, пока пул занят
+    RESULT_CHECK_INTERVAL = 0.25
+    
+    # Флаги из linux/inotify.h
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    
+    def __init__(self, directories: List[str], output_dir: str, template_path: str,
+                 jobs: Optional[int] = None, separator: Optional[str] = None,
+                 cache: Optional[OutputCache] = None, backend: Optional[str] = None,
+                 debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 polling: bool = False):
+        self.directories = directories
+        self.output_dir = output_dir
+        self.template_path = template_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.separator = separator
+        self.cache = cache
+        self.backend = backend
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = polling
+        
+        self.known: Dict[str, Tuple[int, int]] = {}  # путь -> (mtime_ns, размер) последней версии
+        self.names: Dict[str, str] = {}  # путь -> имя PDF
+        self.used_names: set = set()
+        self.pending: Dict[str, Tuple[float, Tuple[int, int]]] = {}  # путь -> (срок, версия)
+        self.running: Dict[str, Any] = {}  # путь -> Future
+        self.dirty: set = set()  # изменились во время рендеринга
+        self.watches: Dict[int, str] = {}
+        self.inotify_fd: Optional[int] = None
+        self._libc = None
+    
+    @staticmethod
+    def _signature(file_path: str) -> Optional[Tuple[int, int]]:
+        """Версия файла: (mtime_ns, размер) или None, если файла нет"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _pdf_path(self, file_path: str) -> str:
+        name = self.names.get(file_path)
+        if name is None:
+            name = self.names[file_path] = BatchConverter.unique_name(os.path.basename(file_path),
+                                                                     self.used_names)
+        return os.path.join(self.output_dir, f"{name}.pdf")
+    
+    def _is_supported(self, file_path: str) -> bool:
+        if os.path.splitext(file_path)[1].lower() not in FileScanner.SUPPORTED_EXTENSIONS:
+            return False
+        parts = os.path.normpath(file_path).split(os.sep)
+        return not any(part in FileScanner.DEFAULT_EXCLUDES for part in parts[:-1])
+    
+    def _touch(self, file_path: str):
+        """Отмечает возможное изменение файла и (пере)запускает отсчет debounce"""
+        if not self._is_supported(file_path):
+            return
+        signature = self._signature(file_path)
+        if signature is None:
+            # Файл удален или переименован: PDF оставляем, перестаем следить
+            self.known.pop(file_path, None)
+            self.pending.pop(file_path, None)
+            return
+        if signature == self.known.get(file_path) and file_path not in self.pending:
+            return
+        self.pending[file_path] = (time.monotonic() + self.debounce, signature)
+    
+    def _scan_initial(self):
+        """Запоминает текущие файлы и ставит в очередь те, чьи PDF отсутствуют или устарели"""
+        for file_path, filename, file_type in FileScanner.scan_directories(self.directories):
+            signature = self._signature(file_path)
+            if signature is None:
+                continue
+            self.known[file_path] = signature
+            pdf_signature = self._signature(self._pdf_path(file_path))
+            if pdf_signature is None or pdf_signature[0] < signature[0]:
+                self.pending[file_path] = (time.monotonic(), signature)
+    
+    def _poll(self):
+        """Опрос: находит новые файлы и сравнивает версии известных"""
+        current = {file_path for file_path, _, _ in FileScanner.scan_directories(self.directories)}
+        for file_path in current | set(self.known):
+            self._touch(file_path)
+    
+    def _open_inotify(self) -> bool:
+        """Подключает inotify через libc и ставит наблюдение на все директории"""
+        if self.polling or not sys.platform.startswith('linux'):
+            return False
+        import ctypes
+        import ctypes.util
+        
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            return False
+        
+        self._libc, self.inotify_fd = libc, fd
+        for directory in self.directories:
+            if os.path.isdir(directory) and not self._watch_tree(directory):
+                os.close(fd)
+                self.inotify_fd = None
+                return False
+        return True
+    
+    def _watch_tree(self, root: str) -> bool:
+        """Ставит наблюдение inotify на директорию и ее поддиректории"""
+        import ctypes
+        
+        for current, dirs, _ in os.walk(root):
+            dirs[:] = [name for name in dirs if name not in FileScanner.DEFAULT_EXCLUDES]
+            wd = self._libc.inotify_add_watch(self.inotify_fd, os.fsencode(current), self.WATCH_MASK)
+            if wd < 0:
+                # Обычно исчерпан лимит fs.inotify.max_user_watches
+                print(f"⚠️  inotify недоступен для {current}: {os.strerror(ctypes.get_errno())}")
+                return False
+            self.watches[wd] = current
+        return True
+    
+    def _read_events(self):
+        """Разбирает накопившиеся события inotify"""
+        import struct
+        
+        try:
+            data = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            offset += 16
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            
+            if mask & self.IN_Q_OVERFLOW:
+                # События потеряны - сверяем все файлы опросом
+                self._poll()
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and name not in FileScanner.DEFAULT_EXCLUDES:
+                    # Новая директория: следим за ней и берем уже появившиеся в ней файлы
+                    self._watch_tree(path)
+                    for file_path, _, _ in FileScanner.scan_directories([path], use_index=False):
+                        self._touch(file_path)
+            else:
+                self._touch(path)
+    
+    def _submit_due(self, executor: "ProcessPoolExecutor"):
+        """Отправляет на рендеринг файлы, которые не менялись debounce секунд"""
+        now = time.monotonic()
+        for file_path, (deadline, signature) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            current = self._signature(file_path)
+            if current is None:
+                del self.pending[file_path]
+                continue
+            if current != signature:
+                # Файл еще дописывается - ждем следующей паузы
+                self.pending[file_path] = (now + self.debounce, current)
+                continue
+            del self.pending[file_path]
+            if file_path in self.running:
+                self.dirty.add(file_path)
+                continue
+            
+            self.known[file_path] = current
+            file_type = FileScanner.SUPPORTED_EXTENSIONS[os.path.splitext(file_path)[1].lower()]
+            name = os.path.splitext(os.path.basename(self._pdf_path(file_path)))[0]
+            print(f"🔄 Изменен {file_path}, рендеринг...")
+            self.running[file_path] = executor.submit(
+                _convert_file_worker, file_path, file_type, self.output_dir, name,
+                self.template_path, self.separator, self.cache, self.backend)
+    
+    def _collect_finished(self):
+        """Выводит результаты завершенного рендеринга"""
+        finished = False
+        for file_path, future in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[file_path]
+            finished = True
+            _, ok, elapsed, detail = future.result()
+            if ok:
+                print(f"✅ {file_path} -> {detail} ({elapsed:.2f} с)")
+            else:
+                print(f"❌ {file_path}: {detail}")
+            if file_path in self.dirty:
+                self.dirty.discard(file_path)
+                self._touch(file_path)
+        if finished and self.cache is not None:
+            self.cache.evict()
+    
+    def _timeout(self, next_poll: Optional[float]) -> Optional[float]:
+        """Сколько можно спать до следующего дела (None - до события inotify)"""
+        candidates = []
+        if self.pending:
+            candidates.append(min(deadline for deadline, _ in self.pending.values()) - time.monotonic())
+        if self.running:
+            candidates.append(self.RESULT_CHECK_INTERVAL)
+        if next_poll is not None:
+            candidates.append(next_poll - time.monotonic())
+        return max(0.0, min(candidates)) if candidates else None
+    
+    def run(self) -> int:
+        """Наблюдает за директориями до прерывания (Ctrl+C)"""
+        import select
+        from concurrent.futures import ProcessPoolExecutor
+        
+        self._scan_initial()
+        use_inotify = self._open_inotify()
+        mode = "inotify" if use_inotify else f"опрос каждые {self.poll_interval:g} с"
+        print(f"👀 Наблюдение за {', '.join(self.directories)} ({mode}), "
+              f"файлов: {len(self.known)}, процессов: {self.jobs}. Ctrl+C - выход")
+        
+        next_poll = time.monotonic() + self.poll_interval
+        executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_ignore_interrupt)
+        try:
+            while True:
+                self._submit_due(executor)
+                timeout = self._timeout(None if use_inotify else next_poll)
+                if use_inotify:
+                    readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+                    if readable:
+                        self._read_events()
+                else:
+                    time.sleep(timeout)
+                    if time.monotonic() >= next_poll:
+                        self._poll()
+                        next_poll = time.monotonic() + self.poll_interval
+                self._collect_finished()
+        except KeyboardInterrupt:
+            print("\nНаблюдение остановлено")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if self.inotify_fd is not None:
+                os.close(self.inotify_fd)
+        return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="DataForgePDF - Генератор PDF из файлов данных")
+    parser.add_argument('--chunk-rows', type=int, default=0, metavar='N',
+                        help=f"рендерить WeasyPrint параллельно фрагментами по N строк "
+                             f"(0 - отключено, рекомендуется {PDFGenerator.DEFAULT_CHUNK_ROWS})")
+    parser.add_argument('--workers', type=int, default=None, metavar='N',
+                        help="количество процессов для рендеринга и разбора больших CSV "
+                             "(по умолчанию - число ядер, 1 - разбирать CSV в одном процессе)")
+    parser.add_argument('--batch', nargs='*', metavar='PATH',
+                        help="пакетный режим: конвертировать все файлы из директорий или glob-шаблонов "
+                             "(по умолчанию data)")
+    parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                        help="количество процессов пакетного режима (по умолчанию - число ядер)")
+    parser.add_argument('--backend', choices=('auto',) + PDFGenerator.BACKENDS, default='auto',
+                        help="backend рендеринга: weasyprint, reportlab или fast - быстрый табличный "
+                             "с постоянной памятью (по умолчанию auto - выбор по оценке стоимости)")
+    parser.add_argument('--calibration', metavar='PATH',
+                        help="уточнить модель выбора backend-а по результатам scripts/benchmark.py")
+    parser.add_argument('--weasyprint-max-seconds', type=float, default=None, metavar='S',
+                        help=f"наибольшее оценочное время для WeasyPrint при автоматическом выборе "
+                             f"(по умолчанию {BackendSelector.DEFAULT_THRESHOLDS['weasyprint_max_seconds']:g})")
+    parser.add_argument('--reportlab-max-seconds', type=float, default=None, metavar='S',
+                        help=f"наибольшее оценочное время для ReportLab при автоматическом выборе "
+                             f"(по умолчанию {BackendSelector.DEFAULT_THRESHOLDS['reportlab_max_seconds']:g})")
+    parser.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                        help=f"бюджет памяти на рендеринг при автоматическом выборе "
+                             f"(по умолчанию {BackendSelector.DEFAULT_THRESHOLDS['memory_budget_mb']:g})")
+    parser.add_argument('--separator', default=None,
+                        help="разделитель колонок TXT файлов (по умолчанию определяется автоматически)")
+    parser.add_argument('--output', default='output', metavar='DIR',
+                        help="директория для PDF файлов (по умолчанию output)")
+    parser.add_argument('--optimize', action='store_true',
+                        help="оптимизировать размер PDF WeasyPrint и ReportLab (потоки объектов, удаление "
+                             "дубликатов; медленнее, для архивных выгрузок)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="не использовать кэш готовых PDF")
+    parser.add_argument('--cache-size', type=int, default=OutputCache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        metavar='MB', help="максимальный размер кэша PDF в мегабайтах (по умолчанию 1024)")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="записывать замеры фаз в JSON Lines файл ('-' - в stderr)")
+    parser.add_argument('--metrics-hook', metavar='MODULE:FUNCTION',
+                        help="передавать замеры фаз функции MODULE:FUNCTION (например, отправка в метрики)")
+    parser.add_argument('--watch', nargs='*', metavar='DIR',
+                        help="режим наблюдения: перерисовывать PDF для новых и измененных файлов "
+                             "в директориях (по умолчанию data)")
+    parser.add_argument('--debounce', type=float, default=FileWatcher.DEFAULT_DEBOUNCE, metavar='S',
+                        help=f"режим наблюдения: сколько секунд файл не должен меняться перед рендерингом "
+                             f"(по умолчанию {FileWatcher.DEFAULT_DEBOUNCE:g})")
+    parser.add_argument('--poll-interval', type=float, default=FileWatcher.DEFAULT_POLL_INTERVAL,
+                        metavar='S', help=f"режим наблюдения без inotify: интервал опроса в секундах "
+                                          f"(по умолчанию {FileWatcher.DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument('--poll', action='store_true',
+                        help="режим наблюдения: использовать опрос вместо inotify (например, для сетевых дисков)")
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT',
+                        help="запустить локальный HTTP-сервис рендеринга на порту PORT")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="адрес HTTP-сервиса (по умолчанию 127.0.0.1)")
+    parser.add_argument('--data-root', action='append', default=[], metavar='DIR',
+                        help="HTTP-сервис: разрешить рендеринг файлов сервера (?path=) из директории DIR "
+                             "(можно указать несколько раз; по умолчанию запрещено)")
+    return parser.parse_args(argv)
+
+
+def run_batch(patterns: List[str], output_dir: str, jobs: Optional[int], separator: Optional[str],
+              cache: Optional[OutputCache] = None, backend: Optional[str] = None) -> int:
+    """Пакетный режим: конвертирует все найденные файлы и возвращает код завершения"""
+    template_path = "templates/template.html"
+    if not os.path.exists(template_path):
+        print(f"Шаблон не найден: {template_path}")
+        return 1
+    
+    started = time.perf_counter()
+    results = BatchConverter.convert_all(patterns, output_dir, template_path, jobs, separator, cache, backend)
+    if not results:
+        print("Файлы данных не найдены!")
+        return 1
+    
+    BatchConverter.print_report(results, time.perf_counter() - started)
+    
+    if cache is not None:
+        cache.evict()
+    
+    return 0 if all(result[1] for result in results) else 1
+
+
+def main(argv: Optional[List[str]] = None) -> Optional[int]:
     """Основная функция программы"""
+    args = parse_args(argv)
+    if args.metrics or args.metrics_hook:
+        Instrumentation.configure(args.metrics, args.metrics_hook)
+    
+    backend = None if args.backend == 'auto' else args.backend
+    if args.optimize:
+        PDFOptimizer.configure(True)
+    if args.calibration or args.weasyprint_max_seconds or args.reportlab_max_seconds or args.memory_budget:
+        try:
+            BackendSelector.configure(args.calibration,
+                                      weasyprint_max_seconds=args.weasyprint_max_seconds,
+                                      reportlab_max_seconds=args.reportlab_max_seconds,
+                                      memory_budget_mb=args.memory_budget)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            return 1
+    
     print("=" * 60)
     print("DataForgePDF - Генератор PDF из файлов данных")
     print("=" * 60)
     
     # Создаем необходимые директории
-    output_dir = "output"
+    output_dir = args.output
     os.makedirs(output_dir, exist_ok=True)
     
+    cache = None if args.no_cache else OutputCache(max_bytes=args.cache_size * 1024 * 1024)
+    
+    if args.batch is not None:
+        return run_batch(args.batch or ["data"], output_dir, args.jobs, args.separator, cache,
+                         backend)
+    
+    if args.watch is not None:
+        template_path = "templates/template.html"
+        if not os.path.exists(template_path):
+            print(f"Шаблон не найден: {template_path}")
+            return 1
+        return FileWatcher(args.watch or ["data"], output_dir, template_path, args.jobs, args.separator,
+                           cache, backend, debounce=args.debounce, poll_interval=args.poll_interval,
+                           polling=args.poll).run()
+    
+    if args.serve is not None:
+        template_path = "templates/template.html"
+        if not os.path.exists(template_path):
+            print(f"Шаблон не найден: {template_path}")
+            return 1
+        RenderService(template_path, workers=args.workers, cache=cache, backend=backend,
+                      data_roots=args.data_root).serve(args.host, args.serve)
+        return 0
+    
     # Определяем директории для сканирования
     data_dirs = ["data", "."]  # Сначала ищем в папке data, затем в текущей
     
@@ -502,44 +4084,26 @@ def main():
         # Читаем данные в зависимости от типа файла
         print("Чтение данных...")
         
-        if file_type == 'CSV файл':
-            columns, rows = DataReader.read_csv(file_path)
-        elif file_type == 'JSON файл':
-            columns, rows = DataReader.read_json(file_path)
-        elif file_type.startswith('Excel'):
-            columns, rows = DataReader.read_excel(file_path)
-        elif file_type.startswith('Word'):
-            columns, rows = DataReader.read_word(file_path)
-        elif file_type == 'Текстовый файл':
-            separator = input("Введите разделитель колонок (по умолчанию табуляция): ").strip()
-            if not separator:
-                separator = '\t'
-            columns, rows = DataReader.read_txt(file_path, separator)
-        else:
+        if file_type not in FileScanner.SUPPORTED_EXTENSIONS.values():
             print(f"Неподдерживаемый тип файла: {file_type}")
             return
         
-        if not columns or not rows:
-            print("Файл не содержит данных")
-            return
-        
-        print(f"Прочитано {len(rows)} строк с {len(columns)} колонками")
-        
-        # Генерируем PDF
-        print("Генерация PDF...")
         template_path = "templates/template.html"
         
         if not os.path.exists(template_path):
             print(f"Шаблон не найден: {template_path}")
             return
         
-        generator = PDFGenerator(template_path)
-        
         # Создаем имя файла без расширения
         base_filename = os.path.splitext(filename)[0]
         
         # Генерируем PDF
-        pdf_path = generator.generate_pdf(columns, rows, output_dir, base_filename)
+        pdf_path = convert_file(file_path, file_type, output_dir, base_filename, template_path,
+                                args.separator, chunk_rows=args.chunk_rows, workers=args.workers,
+                                cache=cache, backend=backend)
+        
+        if cache is not None:
+            cache.evict()
         
         print(f"PDF успешно создан: {pdf_path}")
         
@@ -556,7 +4120,7 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n\nПрограмма прервана пользователем")
     except Exception as e: